@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+
+from .models import AccessCode, AdminCode
+
+
+# {code: role} for every active code, shared by all requests in the process.
+# Both tables are tiny, so they are loaded whole: known and unknown codes
+# alike are then answered without a query until the TTL runs out or a code
+# is saved or deleted in this process (see signals.py).
+_codes = None
+_loaded_at = 0.0
+
+
+def _load_codes():
+    codes = {
+        code: role
+        for code, role in AccessCode.objects.filter(is_active=True).values_list("code", "role")
+    }
+    for code in AdminCode.objects.filter(is_active=True).values_list("code", flat=True):
+        codes[code] = "admin"
+    return codes
+
+
+def code_role(code):
+    """Return the role ("admin" or "player") for ``code``, or None."""
+    global _codes, _loaded_at
+    if not code:
+        return None
+    if _codes is None or time.monotonic() - _loaded_at > settings.QUIZ_ACCESS_CODE_TTL:
+        _codes = _load_codes()
+        _loaded_at = time.monotonic()
+    return _codes.get(code)
+
+
+def is_admin_code(code):
+    return code_role(code) == "admin"
+
+
+def invalidate_codes():
+    global _codes
+    _codes = None
@@ -0,0 +1,125 @@
+import math
+import time
+
+from .metrics import LatencyWindow
+from .querycount import check_budget, count_queries
+
+
+ADMIN = "admin"
+PLAYER = "player"
+VIEWER = "viewer"
+ANYONE = (ADMIN, PLAYER, VIEWER)
+
+ACTIONS = {}
+
+
+class Field:
+    """Expected shape of one key in an action payload."""
+
+    def __init__(self, types, required=True, choices=None, minimum=None, maximum=None):
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.required = required
+        self.choices = choices
+        self.minimum = minimum
+        self.maximum = maximum
+
+
+def compile_schema(fields):
+    """Turn ``{key: Field}`` into a validator returning an error or None."""
+    checks = []
+    for key, field in fields.items():
+        # bool is an int subclass, but ``"points": true`` is never intended.
+        types = field.types
+        reject_bool = bool not in types and int in types
+
+        def check(data, key=key, field=field, types=types, reject_bool=reject_bool):
+            if key not in data or data[key] is None and type(None) not in types:
+                return f"'{key}' is required" if field.required else None
+            value = data[key]
+            if not isinstance(value, types) or reject_bool and isinstance(value, bool):
+                return f"'{key}' has the wrong type"
+            # JSON decoders accept NaN and Infinity; no field wants them.
+            if isinstance(value, float) and not math.isfinite(value):
+                return f"'{key}' must be a finite number"
+            if field.choices is not None and value not in field.choices:
+                return f"'{key}' must be one of {sorted(field.choices)}"
+            if field.minimum is not None and value < field.minimum:
+                return f"'{key}' must be at least {field.minimum}"
+            if field.maximum is not None and value > field.maximum:
+                return f"'{key}' must be at most {field.maximum}"
+            return None
+
+        checks.append(check)
+
+    def validate(data):
+        for check in checks:
+            error = check(data)
+            if error:
+                return error
+        return None
+
+    return validate
+
+
+class Action:
+    def __init__(self, name, handler, roles, fields, query_budget=None):
+        self.name = name
+        self.handler = handler
+        self.roles = frozenset(roles)
+        self.validate = compile_schema(fields)
+        self.query_budget = query_budget
+        self.latency = LatencyWindow()
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+
+
+def action(name, roles=(ADMIN,), query_budget=None, **fields):
+    """Register a GameConsumer method as the handler for ``name``.
+
+    The handler is only called for sockets whose role is in ``roles`` and
+    payloads that match ``fields``. It may return an error string, which is
+    sent back to the client. Running more than ``query_budget`` queries is
+    reported like an HTTP view going over its ``@query_budget``.
+    """
+    def register(handler):
+        ACTIONS[name] = Action(name, handler, roles, fields, query_budget)
+        return handler
+    return register
+
+
+async def dispatch(consumer, data):
+    """Run the handler for ``data["action"]``; return an error or None."""
+    name = data.get("action")
+    registered = ACTIONS.get(name) if isinstance(name, str) else None
+    if registered is None:
+        return "Unknown action"
+    if consumer.role not in registered.roles:
+        return "Not allowed"
+    error = registered.validate(data)
+    if error:
+        return error
+
+    start = time.perf_counter()
+    try:
+        with count_queries() as queries:
+            return await registered.handler(consumer, data)
+    finally:
+        registered.latency.add(time.perf_counter() - start)
+        registered.queries += queries.count
+        registered.max_queries = max(registered.max_queries, queries.count)
+        registered.db_seconds += queries.seconds
+        check_budget(queries, registered.query_budget, f"action {registered.name}")
+
+
+def action_stats():
+    return {
+        name: {
+            **registered.latency.summary(),
+            "queries": registered.queries,
+            "max_queries": registered.max_queries,
+            "db_ms": round(registered.db_seconds * 1000, 3),
+        }
+        for name, registered in ACTIONS.items()
+        if registered.latency.samples
+    }
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .models import GameSession
+from .room import mark_stale
+
+
+logger = logging.getLogger(__name__)
+
+# Workers tell each other about activation changes over this group.
+GROUP = "quiz.active_session"
+
+# Tells our own invalidations apart from other workers'.
+_worker_id = uuid.uuid4().hex
+
+# Summaries of the active sessions, shared by all requests and sockets in
+# the process: {id: ActiveSession}, newest first, or _UNKNOWN until
+# loaded. Dropped when a session's activation changes here (see
+# signals.py) or in another worker (see listen()), and after the TTL in
+# case a message was lost.
+_UNKNOWN = object()
+_active = _UNKNOWN
+_loaded_at = 0.0
+_listener = None
+
+
+class ActiveSession:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    def as_dict(self):
+        return {"id": self.id, "name": self.name}
+
+
+def _load():
+    return {
+        session_id: ActiveSession(session_id, name)
+        for session_id, name in GameSession.objects.filter(is_active=True)
+        .order_by("-id").values_list("id", "name")
+    }
+
+
+def _fresh():
+    return _active is not _UNKNOWN and time.monotonic() - _loaded_at <= settings.QUIZ_ACTIVE_SESSION_TTL
+
+
+def _store(active):
+    global _active, _loaded_at
+    _active = active
+    _loaded_at = time.monotonic()
+    return active
+
+
+def active_sessions():
+    """Return ``{id: ActiveSession}``, newest first. Sync callers only."""
+    if _fresh():
+        return _active
+    return _store(_load())
+
+
+async def aactive_sessions():
+    _ensure_listener()
+    if _fresh():
+        return _active
+    return _store(await database_sync_to_async(_load)())
+
+
+def _pick(sessions, session_id):
+    if session_id is None:
+        # With one session at a time, the one; otherwise the newest.
+        return next(iter(sessions.values()), None)
+    return sessions.get(int(session_id))
+
+
+def current(session_id=None):
+    """Return the ActiveSession with ``session_id`` (by default the newest),
+    or None. Sync callers only."""
+    return _pick(active_sessions(), session_id)
+
+
+async def acurrent(session_id=None):
+    return _pick(await aactive_sessions(), session_id)
+
+
+def forget(session_id=None, broadcast=True):
+    """Drop the cached sessions; with ``broadcast`` other workers do too and
+    reload the room of ``session_id`` (every room if None)."""
+    global _active
+    _active = _UNKNOWN
+    if not broadcast:
+        return
+    try:
+        async_to_sync(get_channel_layer().group_send)(GROUP, {
+            "type": "active_session.changed",
+            "origin": _worker_id,
+            "session": session_id,
+        })
+    except Exception:
+        # Other workers still catch up when their TTL runs out.
+        logger.warning("Couldn't announce an active session change", exc_info=True)
+
+
+def _ensure_listener():
+    global _listener
+    loop = asyncio.get_running_loop()
+    if _listener is None or _listener.done() or _listener.get_loop() is not loop:
+        _listener = loop.create_task(listen())
+
+
+async def listen():
+    """Drop the cached sessions and reload rooms whenever another worker
+    activates or deactivates a session. Started by the first async lookup
+    in each process."""
+    global _active
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    while True:
+        # Joined again now and then: channel layers expire group members.
+        await layer.group_add(GROUP, channel)
+        try:
+            message = await asyncio.wait_for(layer.receive(channel), timeout=3600)
+        except asyncio.TimeoutError:
+            continue
+        if message.get("origin") != _worker_id:
+            _active = _UNKNOWN
+            mark_stale(message.get("session"))
@@ -1,6 +1,6 @@
+from django.conf import settings
 from django.contrib import admin, messages
-from django.db import transaction
-from .models import Team, Question, GameSession, Answer, AdminCode, Participant
+from .models import Team, Question, GameSession, Answer, AdminCode, Participant, ScoreEvent
 
 
 @admin.register(Team)
@@ -8,7 +8,8 @@ class TeamAdmin(admin.ModelAdmin):
     list_display = ["name", "session", "score", "status", "code"]
     list_filter = ["status", "session"]
     search_fields = ["name", "code"]
-    readonly_fields = ["code"]
+    # Scores only change through the ledger (see ledger.py).
+    readonly_fields = ["code", "score"]
     ordering = ["-score"]
 
 
@@ -31,11 +32,12 @@ class GameSessionAdmin(admin.ModelAdmin):
     list_filter = ["is_active", "buzzer_locked"]
     search_fields = ["name"]
     ordering = ["-created_at"]
+    readonly_fields = ["room_owner", "room_lease_until"]
 
-    actions = ["make_active"]
+    actions = ["make_active", "make_inactive"]
 
     def make_active(self, request, queryset):
-        if queryset.count() > 1:
+        if queryset.count() > 1 and not settings.QUIZ_CONCURRENT_SESSIONS:
             self.message_user(
                 request,
                 "You can only activate one session at a time.",
@@ -43,21 +45,30 @@ class GameSessionAdmin(admin.ModelAdmin):
             )
             return
 
-        session = queryset.first()
-
-        with transaction.atomic():
-            GameSession.objects.update(is_active=False)
+        # save() deactivates the others unless sessions run side by side.
+        for session in queryset:
             session.is_active = True
             session.save()
 
+        names = ", ".join(f'"{session.name}"' for session in queryset)
         self.message_user(
             request,
-            f'"{session.name}" is now the active session.',
+            f'Activated {names}.',
             level=messages.SUCCESS
         )
 
     make_active.short_description = "Activate selected session"
 
+    def make_inactive(self, request, queryset):
+        # One save() each so the signals reach live rooms and other workers.
+        for session in queryset.filter(is_active=True):
+            session.is_active = False
+            session.save()
+
+        self.message_user(request, "Selected sessions deactivated.", level=messages.SUCCESS)
+
+    make_inactive.short_description = "Deactivate selected sessions"
+
 
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
@@ -67,6 +78,21 @@ class AnswerAdmin(admin.ModelAdmin):
     ordering = ["-created_at"]
 
 
+@admin.register(ScoreEvent)
+class ScoreEventAdmin(admin.ModelAdmin):
+    list_display = ["team", "session", "delta", "reason", "created_at"]
+    list_filter = ["session", "reason"]
+    search_fields = ["team__name"]
+    ordering = ["-id"]
+
+    # The ledger is append-only; scores change through the API.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(AdminCode)
 class AdminCodeAdmin(admin.ModelAdmin):
     list_display = ["code", "is_active", "created_at"]
@@ -0,0 +1,64 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import GameSession
+
+
+logger = logging.getLogger(__name__)
+
+# Names this process in GameSession.room_owner.
+WORKER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RoomOwnedElsewhere(Exception):
+    def __init__(self, session_id, owner):
+        super().__init__(f"Room {session_id} is held by {owner}")
+        self.owner = owner
+
+
+def claim(session_id):
+    """Claim or renew this worker's lease on a session's live room.
+
+    One conditional UPDATE: it succeeds when nobody holds the room, we
+    already do, or the holder's lease ran out (the worker died). Raises
+    RoomOwnedElsewhere otherwise. A no-op without ``QUIZ_ROOM_LEASE``.
+    Sync callers only.
+    """
+    if not settings.QUIZ_ROOM_LEASE:
+        return
+    now = timezone.now()
+    claimed = GameSession.objects.filter(
+        Q(room_owner="") | Q(room_owner=WORKER) | Q(room_lease_until__lt=now),
+        id=session_id,
+    ).update(
+        room_owner=WORKER,
+        room_lease_until=now + timedelta(seconds=settings.QUIZ_ROOM_LEASE),
+    )
+    if not claimed:
+        owner = GameSession.objects.filter(id=session_id).values_list("room_owner", flat=True).first()
+        if owner is not None:
+            raise RoomOwnedElsewhere(session_id, owner)
+
+
+def held_elsewhere(session):
+    """Whether another worker holds the live room of ``session``."""
+    return bool(
+        settings.QUIZ_ROOM_LEASE
+        and session.room_owner not in ("", WORKER)
+        and session.room_lease_until
+        and session.room_lease_until > timezone.now()
+    )
+
+
+def release(session_id):
+    """Give the room up so another worker can take it at once."""
+    if settings.QUIZ_ROOM_LEASE:
+        GameSession.objects.filter(id=session_id, room_owner=WORKER).update(
+            room_owner="", room_lease_until=None
+        )
@@ -4,3 +4,5 @@ from django.apps import AppConfig
 class QuizApiConfig(AppConfig):
     name = 'quiz_api'
 
+    def ready(self):
+        from . import querycount, signals  # noqa: F401
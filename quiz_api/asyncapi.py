@@ -0,0 +1,70 @@
+import functools
+import json
+
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+
+_renderer = JSONRenderer()
+
+_FORM_TYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+
+
+def json_response(data, status=200):
+    """A JSON response with the same bytes DRF's ``Response`` would send."""
+    return HttpResponse(_renderer.render(data), status=status, content_type="application/json")
+
+
+class _ParseError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _parse(request):
+    # What DRF's default JSON/form/multipart parsers make of the body.
+    if not request.body:
+        return {}
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body)
+        except ValueError as error:
+            raise _ParseError(400, f"JSON parse error - {error}")
+    if request.content_type in _FORM_TYPES:
+        return request.POST
+    raise _ParseError(415, f'Unsupported media type "{request.content_type}" in request.')
+
+
+def async_api_view(methods):
+    """``@api_view`` for ``async def`` views.
+
+    DRF dispatches every view synchronously, so under ASGI each request
+    would hold a worker thread from start to finish. Here the view runs on
+    the event loop and only its queries leave it. The view gets DRF-style
+    ``request.data`` and ``request.query_params``; a ValidationError is
+    answered with a 400, and bad bodies and methods like DRF answers them.
+    """
+    allowed = list(methods) + (["HEAD"] if "GET" in methods else [])
+
+    def decorate(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = json_response({"detail": f'Method "{request.method}" not allowed.'}, 405)
+                response["Allow"] = ", ".join(allowed)
+                return response
+            try:
+                request.data = _parse(request)
+            except _ParseError as error:
+                return json_response({"detail": error.detail}, error.status)
+            request.query_params = request.GET
+            try:
+                return await view(request, *args, **kwargs)
+            except ValidationError as error:
+                return json_response(error.detail, 400)
+        return wrapper
+    return decorate
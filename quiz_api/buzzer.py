@@ -0,0 +1,143 @@
+import asyncio
+import bisect
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from .metrics import LatencyWindow
+from .models import GameSession
+from .statuses import BUZZED, transition_error, transition_team
+
+
+# Why a buzz was turned away: the team isn't in the room, or its status
+# doesn't allow buzzing (see statuses.py).
+CANT_BUZZ = "That team can't buzz now"
+
+
+class BuzzerEngine:
+    """Decides who buzzed first in a room.
+
+    Every buzz is stamped with the time the server received it and kept in
+    the session's ``buzz_queue`` in arrival order. Buzzes for a room are
+    arbitrated one at a time under a per-room lock, so the first one in
+    wins, and every team that buzzes moves to ``buzzed`` as it would over
+    REST. In ``"database"`` mode the win is also claimed with a single
+    conditional UPDATE, which keeps two copies of the room (in workers
+    that briefly both hold its lease) from crowning different winners.
+    """
+
+    def __init__(self, room, mode=None):
+        self.room = room
+        self.mode = mode or settings.QUIZ_BUZZER_ARBITRATION
+        self.lock = asyncio.Lock()
+        self.latencies = LatencyWindow()
+
+    async def buzz(self, team_id, received_at, received_clock):
+        """Arbitrate one buzz.
+
+        ``received_at`` is the wall-clock receive time in epoch ms and goes
+        into the queue; ``received_clock`` is the matching
+        ``time.perf_counter()`` reading used to measure arbitration latency.
+        """
+        async with self.lock:
+            result = await self._arbitrate(team_id, received_at)
+
+        latency = time.perf_counter() - received_clock
+        self.latencies.add(latency)
+        result["arbitration_ms"] = round(latency * 1000, 3)
+        return result
+
+    async def _arbitrate(self, team_id, received_at):
+        room = self.room
+        team = room.get_team(team_id)
+        if team is None:
+            return {"accepted": False, "position": None, "error": CANT_BUZZ}
+
+        queue = room.session.buzz_queue
+        for position, entry in enumerate(queue, start=1):
+            if entry["team"] == team.id:
+                return {"accepted": False, "position": position}
+        if transition_error(team.status, BUZZED):
+            return {"accepted": False, "position": None, "error": CANT_BUZZ}
+
+        won = False
+        if not room.session.buzzer_locked:
+            if self.mode == "database":
+                won, winner_id = await database_sync_to_async(claim_buzzer)(room.session_id, team.id)
+                if not won and winner_id is not None:
+                    room.lock_buzzer(winner_id)
+            else:
+                won = True
+        if won:
+            room.lock_buzzer(team.id)
+
+        room.set_team_status(team.id, BUZZED)
+        position = room.add_buzz(team.id, received_at)
+        return {"accepted": won, "position": position}
+
+    async def release(self):
+        # Another worker may try to claim the buzzer as soon as the next
+        # question starts, so the reset can't wait for the write-behind.
+        if self.mode == "database":
+            await self.room.flush()
+
+    def stats(self):
+        return self.latencies.summary()
+
+
+def claim_buzzer(session_id, team_id):
+    """Lock the buzzer for ``team_id`` unless somebody already holds it.
+
+    Returns ``(won, active_team_id)``.
+    """
+    won = GameSession.objects.filter(
+        id=session_id,
+        buzzer_locked=False
+    ).update(buzzer_locked=True, active_team_id=team_id)
+    if won:
+        return True, team_id
+    winner = GameSession.objects.filter(id=session_id).values_list(
+        "active_team_id", flat=True
+    ).first()
+    return False, winner
+
+
+def record_buzz(session_id, team_id, received_at):
+    """Record a buzz made while no worker holds the session's room.
+
+    In one transaction: move the team to buzzed, lock the buzzer for it
+    unless somebody already holds it, and add the buzz to ``buzz_queue``
+    in time order like the room does; a team already in the queue stays
+    where it is. Returns ``(won, active_team_id, buzz_queue)``, or None if
+    the team can't buzz. Sync callers only.
+    """
+    with transaction.atomic():
+        session = GameSession.objects.select_for_update().only(
+            "buzzer_locked", "active_team", "buzz_queue"
+        ).get(id=session_id)
+        if any(entry["team"] == team_id for entry in session.buzz_queue):
+            return False, session.active_team_id, session.buzz_queue
+        if not transition_team(session_id, team_id, BUZZED):
+            return None
+        queue, _ = insert_buzz(session.buzz_queue, team_id, received_at)
+        fields = {"buzz_queue": queue}
+        won = not session.buzzer_locked
+        if won:
+            fields.update(buzzer_locked=True, active_team_id=team_id)
+        GameSession.objects.filter(id=session_id).update(**fields)
+    return won, team_id if won else session.active_team_id, queue
+
+
+def insert_buzz(queue, team_id, received_at):
+    """Return a copy of ``queue`` with the buzz inserted in time order."""
+    queue = list(queue)
+    times = [entry["received_at"] for entry in queue]
+    index = bisect.bisect_right(times, received_at)
+    queue.insert(index, {"team": team_id, "received_at": received_at})
+    return queue, index + 1
+
+
+def receive_stamp():
+    return round(time.time() * 1000, 3), time.perf_counter()
@@ -1,200 +1,343 @@
-import json
+import logging
+from urllib.parse import parse_qs
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import GameSession, Team
-from .serializers import GameSessionSerializer, TeamSerializer
+from . import active_session
+from .access import is_admin_code
+from .actions import (
+    ADMIN, ANYONE, PLAYER, VIEWER, Field, action, action_stats, compile_schema, dispatch
+)
+from .affinity import RoomOwnedElsewhere
+from .buzzer import receive_stamp
+from .models import GameSession, Question, TEAM_STATUSES
+from .room import get_room
+from .timer import MAX_SECONDS
+from .wire import negotiate
 
 
+logger = logging.getLogger(__name__)
+
+# Close code for a socket that reached a worker not holding its room.
+ROOM_ELSEWHERE = 4009
+
+validate_score_entry = compile_schema({
+    "team_id": Field(int),
+    "points": Field(int),
+    "reason": Field(str, required=False),
+})
 
-@database_sync_to_async
-def is_valid_active_session(session_id):
-    return GameSession.objects.filter(
-        id=session_id,
-        is_active=True
-    ).exists()
 
 class GameConsumer(AsyncWebsocketConsumer):
 
     async def connect(self):
         self.session_id = self.scope["url_route"]["kwargs"]["session_id"]
         self.user = self.scope["user"]
+        self.room = None
+        self.codec, subprotocol = negotiate(self.scope)
+        query = parse_qs(self.scope.get("query_string", b"").decode())
 
     # 🔒 Check if session exists AND is active
-        valid_session = await is_valid_active_session(self.session_id)
+        # The cached lookup turns away stale links without loading a room.
+        if not await self.is_valid_active_session(self.session_id):
+            await self.close()
+            return
+        try:
+            room = await get_room(self.session_id, active_only=True)
+        except RoomOwnedElsewhere as error:
+            # The proxy sent this socket to the wrong worker.
+            logger.warning("Refused a socket for room %s: held by %s", self.session_id, error.owner)
+            # Accepted first so the client sees the code, not a failed handshake.
+            await self.accept(subprotocol)
+            await self.close(code=ROOM_ELSEWHERE)
+            return
 
-        if not valid_session:
+        if room is None:
             await self.close()
             return
 
-        self.room_group_name = f"quiz_game_{self.session_id}"
+        # Joined before anything else awaits: a room nobody has joined may
+        # be dropped by the last socket leaving it meanwhile.
+        room.join(self.codec.name)
+        try:
+            await self.resolve_role(room, query)
+        except Exception:
+            await room.leave(self.codec.name)
+            raise
+        self.room = room
+
+        self.room_group_name = self.room.group_name
 
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
 
-        await self.accept()
-        await self.send_game_state()
+        await self.accept(subprotocol)
+
+        # A reconnecting client passes the last ``epoch``/``seq`` it saw.
+        await self.send_game_state(
+            query.get("epoch", [None])[0],
+            query.get("seq", [None])[0]
+        )
     async def disconnect(self, close_code):
+        if self.room is None:
+            return
+
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
+        await self.room.leave(self.codec.name)
+
+    async def resolve_role(self, room, query):
+        # ``?admin_code=`` for the quiz master, ``?team_code=`` for a team
+        # in this room; everyone else can only watch.
+        self.role = VIEWER
+        self.team_id = None
+
+        admin_code = query.get("admin_code", [None])[0]
+        team_code = query.get("team_code", [None])[0]
+        if admin_code and await database_sync_to_async(is_admin_code)(admin_code):
+            self.role = ADMIN
+        elif team_code:
+            team = room.get_team_by_code(team_code)
+            if team is not None:
+                self.role = PLAYER
+                self.team_id = team.id
+
+    async def receive(self, text_data=None, bytes_data=None):
+        self.received = receive_stamp()
+        frame = text_data if text_data is not None else bytes_data
+
+        # Everything below is rejected before touching the room or the DB.
+        if len(frame) > settings.QUIZ_MAX_FRAME_BYTES:
+            await self.send_error(None, "Frame too large")
+            return
+        try:
+            data = self.codec.decode(frame)
+        except Exception:
+            await self.send_error(None, "Malformed frame")
+            return
+        if not isinstance(data, dict):
+            await self.send_error(None, "Malformed frame")
+            return
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        action = data.get("action")
-
-        if action == "update_score":
-            await self.update_score(data)
-            await self.broadcast_game_state()
-
-        elif action == "update_status":
-            await self.update_team_status(data)
-            await self.broadcast_game_state()
-
-        elif action == "next_question":
-            await self.next_question(data)
+        if not self.room.loaded and not await self.room.load():
+            # The session was deleted; room_closed is on its way.
+            await self.close()
+            return
 
-        elif action == "buzz":
-            await self.handle_buzz(data)
+        error = await dispatch(self, data)
+        if error:
+            name = data.get("action")
+            await self.send_error(name if isinstance(name, str) else None, error)
 
-        elif action == "timer_tick":
-            await self.timer_tick(data)
+    async def send_error(self, action_name, error):
+        await self.send_payload({
+            "type": "error",
+            "action": action_name,
+            "error": error
+        })
 
     # =====================================
     # GAME STATE
     # =====================================
 
-    async def send_game_state(self):
-        session = await self.get_session()
-        teams = await self.get_teams()
+    async def send_payload(self, payload):
+        await self.send_frame(self.codec.encode(payload))
+
+    async def send_frame(self, frame):
+        if self.codec.binary:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def send_game_state(self, epoch=None, seq=None):
+        """Replay what the client missed since ``seq``, or send a snapshot."""
+        try:
+            seq = int(seq)
+        except (TypeError, ValueError):
+            seq = None
+
+        missed = self.room.replay(epoch, seq)
+        if missed is None:
+            await self.send_payload({
+                "type": "game_state",
+                **self.room.snapshot()
+            })
+            return
 
-        await self.send(text_data=json.dumps({
-            "type": "game_state",
-            "session": session,
-            "teams": teams
-        }))
+        for payload in missed:
+            await self.send_payload(payload)
 
     async def broadcast_game_state(self):
-        session = await self.get_session()
-        teams = await self.get_teams()
+        await self.room.broadcast_state()
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "game_state_message",
-                "session": session,
-                "teams": teams
-            }
-        )
+    async def frame_message(self, event):
+        # Group broadcasts arrive already encoded by RoomState.group_send.
+        await self.send_frame(event["frames"][self.codec.name])
+
+    async def room_event(self, event):
+        # Changes made over REST; see room.notify_room.
+        await self.room.apply_event(event)
+
+    async def room_buzz(self, event):
+        # Buzzes made over REST; see room.buzz_room.
+        await self.room.remote_buzz(event)
+
+    async def room_closed(self, event):
+        # The session was deleted; see RoomState.load.
+        await self.close()
 
-    async def game_state_message(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "game_state",
-            "session": event["session"],
-            "teams": event["teams"]
-        }))
+    @action("resync", roles=ANYONE, query_budget=0,
+            epoch=Field(str, required=False), seq=Field(int, required=False))
+    async def resync(self, data):
+        # Client noticed a gap in ``seq``.
+        await self.send_game_state(data.get("epoch"), data.get("seq"))
+
+    @action("room_stats", query_budget=0)
+    async def room_stats(self, data):
+        await self.send_payload({
+            "type": "room_stats",
+            "stats": {**self.room.stats(), "actions": action_stats()}
+        })
 
     # =====================================
     # NEXT QUESTION
     # =====================================
 
+    @action("next_question", query_budget=1, question_id=Field((int, type(None)), required=False))
     async def next_question(self, data):
         question_id = data.get("question_id")
-        await self.reset_for_next_question(question_id)
+        # Checked here: the room only finds out at its next flush.
+        if question_id is not None and not await self.question_exists(question_id):
+            return "Unknown question"
+        self.room.next_question(question_id)
+        await self.room.buzzer.release()
         await self.broadcast_game_state()
 
-    @database_sync_to_async
-    def reset_for_next_question(self, question_id):
-        session = GameSession.objects.filter(id=self.session_id).first()
-        if not session:
-            return
-
-        session.current_question_id = question_id
-        session.active_team = None
-        session.buzzer_locked = False
-        session.save()
-
     # =====================================
     # BUZZER LOGIC
     # =====================================
 
+    @action("buzz", roles=(ADMIN, PLAYER), query_budget=2, team_id=Field(int, required=False))
     async def handle_buzz(self, data):
-        team_id = data.get("team_id")
-        await self.lock_buzzer(team_id)
+        # Players always buzz for their own team.
+        team_id = self.team_id if self.role == PLAYER else data.get("team_id")
+        if team_id is None:
+            return "'team_id' is required"
+
+        received_at, received_clock = self.received
+        result = await self.room.buzzer.buzz(team_id, received_at, received_clock)
+
+        await self.send_payload({
+            "type": "buzz_result",
+            "received_at": received_at,
+            **result
+        })
         await self.broadcast_game_state()
 
-    @database_sync_to_async
-    def lock_buzzer(self, team_id):
-        session = GameSession.objects.filter(id=self.session_id).first()
-        if not session or session.buzzer_locked:
-            return
-
-        team = Team.objects.filter(id=team_id).first()
-        if not team:
-            return
+    # =====================================
+    # ANSWERS
+    # =====================================
 
-        session.active_team = team
-        session.buzzer_locked = True
-        session.save()
+    # No query budget: every QUIZ_ANSWER_BATCH_SIZE-th answer flushes the room.
+    @action("submit_answer", roles=(ADMIN, PLAYER),
+            answer=Field(str), team_id=Field(int, required=False))
+    async def submit_answer(self, data):
+        team_id = self.team_id if self.role == PLAYER else data.get("team_id")
+        if team_id is None:
+            return "'team_id' is required"
+
+        answer, error = self.room.submit_answer(team_id, data["answer"], self.received[0])
+        if error:
+            return error
+
+        await self.send_payload({
+            "type": "answer_ack",
+            "answer_id": str(answer.id),
+            "question_id": answer.question_id,
+            "time_taken": answer.time_taken
+        })
+        await self.room.flush_answers_if_full()
 
     # =====================================
-    # DATABASE HELPERS
+    # TIMER
     # =====================================
 
-    @database_sync_to_async
-    def get_session(self):
-        session = GameSession.objects.filter(id=self.session_id).first()
-        if session:
-            return GameSessionSerializer(session).data
-        return None
-
-    @database_sync_to_async
-    def get_teams(self):
-        teams = Team.objects.filter(session_id=self.session_id)
-        return TeamSerializer(teams, many=True).data
-
-    @database_sync_to_async
-    def update_score(self, data):
-        team = Team.objects.filter(id=data.get("team_id")).first()
-        if team:
-            points = data.get("points", 0)
-            team.score = max(0, team.score + points)
-            team.save()
-
-    @database_sync_to_async
-    def update_team_status(self, data):
-        Team.objects.filter(id=data.get("team_id")).update(
-            status=data.get("status")
-        )
+    @action("timer_start", query_budget=0,
+            seconds=Field((int, float), minimum=0, maximum=MAX_SECONDS))
+    async def timer_start(self, data):
+        await self.room.timer.start(data["seconds"])
 
-    @database_sync_to_async
-    def get_active_session(self):
-        return GameSession.objects.filter(is_active=True).first()
+    @action("timer_pause", query_budget=0)
+    async def timer_pause(self, data):
+        await self.room.timer.pause()
 
+    @action("timer_resume", query_budget=0)
+    async def timer_resume(self, data):
+        await self.room.timer.resume()
+
+    @action("timer_stop", query_budget=0)
+    async def timer_stop(self, data):
+        await self.room.timer.stop()
 
-    @database_sync_to_async
-    def is_valid_active_session(self, session_id):
-        return GameSession.objects.filter(
-            id=session_id,
-            is_active=True
-        ).exists()
     # =====================================
-    # TIMER
+    # ROOM STATE
     # =====================================
 
-    async def timer_tick(self, data):
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                "type": "timer_message",
-                "seconds": data.get("seconds")
-            }
-        )
+    @action("update_score", query_budget=0, team_id=Field(int), points=Field(int, required=False),
+            reason=Field(str, required=False))
+    async def update_score(self, data):
+        if not self.room.update_score(
+            data["team_id"], data.get("points", 0), data.get("reason", "")
+        ):
+            return "Unknown team"
+        await self.broadcast_game_state()
+
+    @action("update_scores", query_budget=0, entries=Field(list))
+    async def update_scores(self, data):
+        # [{"team_id": 1, "points": 5, "reason": "..."}, ...]; one broadcast.
+        entries = data["entries"]
+        if not all(
+            isinstance(entry, dict) and validate_score_entry(entry) is None
+            for entry in entries
+        ):
+            return "Each entry needs an int 'team_id' and 'points'"
+        unknown = [
+            entry["team_id"] for entry in entries
+            if not self.room.update_score(
+                entry["team_id"], entry["points"], entry.get("reason", "")
+            )
+        ]
+        await self.broadcast_game_state()
+        if unknown:
+            return f"Unknown teams: {unknown}"
+
+    @action("update_status", query_budget=0, team_id=Field(int), status=Field(str, choices=TEAM_STATUSES))
+    async def update_team_status(self, data):
+        error = self.room.set_team_status(data["team_id"], data["status"])
+        if error:
+            return error
+        await self.broadcast_game_state()
+
+    # =====================================
+    # DATABASE HELPERS
+    # =====================================
 
-    async def timer_message(self, event):
-        await self.send(text_data=json.dumps({
-            "type": "timer",
-            "seconds": event["seconds"]
-        }))
\ No newline at end of file
+    async def get_active_session(self):
+        active = await active_session.acurrent()
+        if active is None:
+            return None
+        return await database_sync_to_async(
+            GameSession.objects.filter(id=active.id).first
+        )()
+
+    async def is_valid_active_session(self, session_id):
+        return await active_session.acurrent(session_id) is not None
+
+    async def question_exists(self, question_id):
+        return await database_sync_to_async(
+            Question.objects.filter(id=question_id).exists
+        )()
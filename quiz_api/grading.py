@@ -0,0 +1,182 @@
+import re
+import string
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.db.models import Subquery
+
+from .models import Question
+
+
+# Verdicts. AMBIGUOUS answers are left ungraded for an admin to review.
+CORRECT = True
+WRONG = False
+AMBIGUOUS = None
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+# "b", "b)", "(b)", "b." and "option b" all pick option B.
+_OPTION_LETTER = re.compile(r"^(?:option )?([a-z])$")
+
+
+def normalize(text):
+    """Casefold, strip diacritics and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _PUNCTUATION.sub(" ", text.casefold())
+    return " ".join(text.split())
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between ``a`` and ``b``, or ``limit + 1`` as
+    soon as it is known to exceed ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def _fuzz_limit(text):
+    # Typos only count in words long enough to have them, and never in
+    # numbers: "1066" vs "1067" is a wrong answer, not a typo.
+    if any(char.isdigit() for char in text):
+        return 0
+    return min(settings.QUIZ_GRADING_MAX_EDITS, len(text) // 4)
+
+
+class AnswerKey:
+    """Precompiled accepted answers for one question.
+
+    ``Question.answer`` may list alternatives separated by ``|``. For
+    multiple-choice questions (``options`` set) the answer can be given as
+    the option letter or its text, and so can the submission.
+    """
+
+    __slots__ = ("accepted", "options")
+
+    def __init__(self, answer, options=None):
+        # {normalized option text or letter: normalized option text}
+        self.options = {}
+        if isinstance(options, dict):
+            options = [
+                (normalize(letter), text) for letter, text in options.items()
+            ]
+        elif isinstance(options, list):
+            options = [
+                (letter.lower(), text)
+                for letter, text in zip(string.ascii_uppercase, options)
+            ]
+        for letter, text in options or []:
+            text = normalize(text)
+            self.options[letter] = text
+            self.options.setdefault(text, text)
+
+        self.accepted = frozenset(
+            self.options.get(alternative, alternative)
+            for alternative in map(normalize, str(answer).split("|"))
+            if alternative
+        )
+
+    def _choose(self, text):
+        match = _OPTION_LETTER.match(text)
+        if match and match.group(1) in self.options:
+            return self.options[match.group(1)]
+        if text in self.options:
+            return self.options[text]
+        close = []
+        for option in set(self.options.values()):
+            limit = _fuzz_limit(option)
+            if edit_distance(text, option, limit) <= limit:
+                close.append(option)
+        return close[0] if len(close) == 1 else None
+
+    def grade(self, submitted):
+        text = normalize(submitted)
+        if not text:
+            return WRONG
+        if text in self.accepted:
+            return CORRECT
+
+        if self.options:
+            choice = self._choose(text)
+            if choice is None:
+                return AMBIGUOUS
+            return choice in self.accepted
+
+        verdict = WRONG
+        for accepted in self.accepted:
+            limit = _fuzz_limit(accepted)
+            distance = edit_distance(text, accepted, 2 * limit)
+            if distance <= limit:
+                return CORRECT
+            if distance <= 2 * limit:
+                verdict = AMBIGUOUS
+        return verdict
+
+
+_keys = {}
+_keys_lock = threading.Lock()
+
+
+def _compile(questions):
+    keys = {
+        question_id: AnswerKey(answer, options)
+        for question_id, answer, options in questions.values_list("id", "answer", "options")
+    }
+    with _keys_lock:
+        _keys.update(keys)
+    return keys
+
+
+def get_answer_key(question_id):
+    """Return the key for a question, or None if it doesn't exist.
+
+    A miss compiles the question's whole round in one query, so the rest
+    of the round is graded from memory. Sync callers only.
+    """
+    key = _keys.get(question_id)
+    if key is None:
+        same_round = Question.objects.filter(id=question_id).values("round")[:1]
+        key = _compile(Question.objects.filter(round=Subquery(same_round))).get(question_id)
+    return key
+
+
+def forget_questions():
+    # Questions are edited between games, not during them; start over.
+    with _keys_lock:
+        _keys.clear()
+
+
+def grade_answers(answers):
+    """Grade unevaluated ``Answer`` instances in place.
+
+    Correct answers get ``QUIZ_GRADING_POINTS``, wrong ones 0; ambiguous
+    ones are left with ``is_correct`` None. Returns ledger entries for the
+    points awarded.
+    """
+    entries = []
+    for answer in answers:
+        if answer.is_correct is not None:
+            continue
+        key = get_answer_key(answer.question_id)
+        if key is None:
+            continue
+        verdict = key.grade(answer.answer_text)
+        if verdict is AMBIGUOUS:
+            continue
+        answer.is_correct = verdict
+        answer.points_awarded = settings.QUIZ_GRADING_POINTS if verdict else 0
+        if answer.points_awarded:
+            entries.append((answer.team_id, answer.points_awarded, "auto", answer.id))
+    return entries
@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+from .models import GameSession, Team
+
+
+class Leaderboard:
+    """Teams of one session, kept sorted by score (best first).
+
+    Score changes move a single entry, so reading the top ``k`` is O(k).
+    The board is shared by REST worker threads and the event loop, hence
+    the lock. A live room in this process keeps it current (``live``);
+    otherwise it is reloaded after ``QUIZ_LEADERBOARD_TTL`` seconds, since
+    other workers change scores behind its back.
+    """
+
+    def __init__(self, session_id, teams):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.names = {}
+        self.scores = {}
+        self.order = []
+        self.live = False
+        for team_id, name, score in teams:
+            self._set(team_id, name, score)
+        self.published = self._ranks()
+        self.loaded_at = time.monotonic()
+
+    @property
+    def fresh(self):
+        return self.live or time.monotonic() - self.loaded_at <= settings.QUIZ_LEADERBOARD_TTL
+
+    def sync(self, teams):
+        """Bring the board in line with ``(id, name, score)`` rows."""
+        teams = list(teams)
+        for team_id in set(self.scores) - {team_id for team_id, _, _ in teams}:
+            self.remove(team_id)
+        for team_id, name, score in teams:
+            self.update(team_id, score, name)
+        self.loaded_at = time.monotonic()
+
+    @property
+    def etag(self):
+        return f'W/"{self.epoch}-{self.version}"'
+
+    def _set(self, team_id, name, score):
+        self._unlink(team_id)
+        self.names[team_id] = name
+        self.scores[team_id] = score
+        bisect.insort(self.order, (-score, team_id))
+
+    def _unlink(self, team_id):
+        if team_id in self.scores:
+            entry = (-self.scores.pop(team_id), team_id)
+            del self.order[bisect.bisect_left(self.order, entry)]
+            del self.names[team_id]
+
+    def update(self, team_id, score, name=None):
+        with self.lock:
+            name = self.names.get(team_id, "") if name is None else name
+            if self.scores.get(team_id) == score and self.names.get(team_id) == name:
+                return
+            self._set(team_id, name, score)
+            self.version += 1
+
+    def remove(self, team_id):
+        with self.lock:
+            if team_id in self.scores:
+                self._unlink(team_id)
+                self.version += 1
+
+    def top(self, k=None):
+        """Return ``(rows, etag)`` for the best ``k`` teams (all if None).
+
+        Ties share a rank ("1224" ranking); ``gap`` is points behind the
+        leader.
+        """
+        with self.lock:
+            entries = self.order if k is None else self.order[:k]
+            leader = -entries[0][0] if entries else 0
+            rows = []
+            rank, previous = 0, None
+            for position, (negative_score, team_id) in enumerate(entries, start=1):
+                if negative_score != previous:
+                    rank, previous = position, negative_score
+                score = -negative_score
+                rows.append({
+                    "id": team_id,
+                    "name": self.names[team_id],
+                    "score": score,
+                    "rank": rank,
+                    "gap": leader - score,
+                })
+            return rows, self.etag
+
+    def _ranks(self):
+        ranks = {}
+        rank, previous = 0, None
+        for position, (negative_score, team_id) in enumerate(self.order, start=1):
+            if negative_score != previous:
+                rank, previous = position, negative_score
+            ranks[team_id] = rank
+        return ranks
+
+    def rank_changes(self):
+        """Return teams whose rank moved since the last call."""
+        with self.lock:
+            current = self._ranks()
+            changes = [
+                {"team": team_id, "rank": rank, "previous": self.published.get(team_id)}
+                for team_id, rank in current.items()
+                if self.published.get(team_id) != rank
+            ]
+            self.published = current
+            return changes
+
+
+_boards = {}
+_boards_lock = threading.Lock()
+
+
+def peek(session_id):
+    return _boards.get(session_id)
+
+
+def get_leaderboard(session_id):
+    """Return the board for ``session_id``, loading it from the database
+    the first time and once it is no longer fresh. None if the session
+    doesn't exist. Sync callers only."""
+    board = _boards.get(session_id)
+    if board is not None and board.fresh:
+        return board
+    if not GameSession.objects.filter(id=session_id).exists():
+        reset_leaderboards(session_id)
+        return None
+    teams = Team.objects.filter(session_id=session_id).values_list("id", "name", "score")
+    if board is not None:
+        board.sync(teams)
+        return board
+    with _boards_lock:
+        return _boards.setdefault(session_id, Leaderboard(session_id, teams))
+
+
+def sync_teams(session_id, teams):
+    """Bring the board in line with ``teams`` (model instances) in memory."""
+    rows = [(team.id, team.name, team.score) for team in teams]
+    board = _boards.get(session_id)
+    if board is None:
+        with _boards_lock:
+            board = _boards.setdefault(session_id, Leaderboard(session_id, rows))
+        return board
+    board.sync(rows)
+    return board
+
+
+def team_saved(team):
+    for session_id, board in list(_boards.items()):
+        if session_id == team.session_id:
+            board.update(team.id, team.score, team.name)
+        elif team.id in board.scores:
+            board.remove(team.id)
+
+
+def team_deleted(team):
+    board = _boards.get(team.session_id)
+    if board is not None:
+        board.remove(team.id)
+
+
+def reset_leaderboards(session_id=None):
+    # For bulk updates that bypass signals; boards rebuild on next use.
+    with _boards_lock:
+        if session_id is None:
+            _boards.clear()
+        else:
+            _boards.pop(session_id, None)
@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+
+from . import leaderboard
+from .models import ScoreEvent, Team
+
+
+def apply_score_entries(entries):
+    """Apply ``(team_id, delta, reason[, answer_id])`` entries atomically.
+
+    The batch is one UPDATE, one SELECT and one INSERT however many teams
+    it touches. Each team's entries are folded into a single
+    ``GREATEST(score + total, floor)``, which is what applying them one by
+    one with ``max(0, score + delta)`` gives, so concurrent writers can't
+    lose each other's points. The UPDATE runs before the insert so that,
+    per team, ledger ``id`` order is the order the row lock granted.
+    Returns ``{team_id: (session_id, new_score)}`` for the teams that exist.
+    """
+    entries = [tuple(entry) + (None,) * (4 - len(entry)) for entry in entries]
+    if not entries:
+        return {}
+
+    # {team_id: (total, floor)}, using
+    # max(0, max(floor, x + total) + delta)
+    #     == max(max(0, floor + delta), x + total + delta)
+    folded = {}
+    for team_id, delta, _, _ in entries:
+        if team_id in folded:
+            total, floor = folded[team_id]
+            folded[team_id] = (total + delta, max(0, floor + delta))
+        else:
+            folded[team_id] = (delta, 0)
+
+    with transaction.atomic():
+        Team.objects.filter(id__in=folded).update(score=Case(*(
+            When(id=team_id, then=Greatest(F("score") + total, Value(floor)))
+            for team_id, (total, floor) in folded.items()
+        ), default=F("score")))
+        totals = {
+            team_id: (session_id, score)
+            for team_id, session_id, score in Team.objects.filter(
+                id__in=folded
+            ).values_list("id", "session_id", "score")
+        }
+        ScoreEvent.objects.bulk_create(
+            ScoreEvent(
+                team_id=team_id,
+                session_id=totals[team_id][0],
+                delta=delta,
+                reason=reason or "",
+                answer_id=answer_id,
+            )
+            for team_id, delta, reason, answer_id in entries
+            if team_id in totals
+        )
+
+    for team_id, (session_id, score) in totals.items():
+        board = leaderboard.peek(session_id)
+        if board is not None:
+            board.update(team_id, score)
+    return totals
+
+
+def replay_scores(session_id=None):
+    """Recompute team totals from the ledger alone: ``{team_id: score}``."""
+    events = ScoreEvent.objects.order_by("id")
+    teams = Team.objects.all()
+    if session_id is not None:
+        events = events.filter(session_id=session_id)
+        teams = teams.filter(session_id=session_id)
+
+    totals = dict.fromkeys(teams.values_list("id", flat=True), 0)
+    for team_id, delta in events.values_list("team_id", "delta").iterator():
+        totals[team_id] = max(0, totals.get(team_id, 0) + delta)
+    return totals
@@ -0,0 +1,32 @@
+from django.core.management.base import CommandError
+from django.db import connection
+
+from quiz_api.models import GameSession, Team
+from quiz_api.room import RoomState
+
+
+# A round number no real quiz uses, for the throwaway questions.
+BENCH_ROUND = 9999
+
+LOCAL_HOSTS = ("", "localhost", "127.0.0.1", "::1")
+
+
+def make_room(team_count, session_id=0):
+    """Build a loaded room with ``team_count`` teams without touching the DB."""
+    room = RoomState(session_id)
+    room.session = GameSession(id=session_id, name="bench", is_active=True)
+    room.teams = {
+        i: Team(id=i, name=f"Team {i}", code=f"BENCH{i:04d}", session_id=session_id)
+        for i in range(1, team_count + 1)
+    }
+    return room
+
+
+def require_local_database():
+    # Benchmarks write throwaway rows that every worker on the same
+    # database would see.
+    if connection.vendor != "sqlite" and connection.settings_dict["HOST"] not in LOCAL_HOSTS:
+        raise CommandError(
+            f"Refusing to benchmark against {connection.settings_dict['HOST']}: "
+            "point DATABASE_URL at a local database"
+        )
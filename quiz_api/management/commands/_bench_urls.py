@@ -0,0 +1,55 @@
+"""URLconf for bench_player_api: the app's routes plus, under ``api/sync/``,
+the DRF versions of the async player endpoints to compare against."""
+from django.urls import include, path
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from quiz_api import active_session
+from quiz_api.buzzer import claim_buzzer
+from quiz_api.models import GameSession, Team
+from quiz_api.room import notify_room
+from quiz_api.serializers import GameSessionSerializer, TeamSerializer
+from quiz_api.statuses import BUZZED, transition_team
+from quiz_api.views import AnswerViewSet
+
+
+@api_view(["POST"])
+def team_login(request):
+    try:
+        team = Team.objects.get(code=request.data.get("code"))
+        return Response({"success": True, "team": TeamSerializer(team).data})
+    except Team.DoesNotExist:
+        return Response({"success": False, "message": "Invalid team code"}, status=400)
+
+
+@api_view(["GET"])
+def get_active_session(request):
+    session = active_session.current()
+    if not session:
+        return Response({"error": "No active session"}, status=404)
+    return Response(session.as_dict())
+
+
+@api_view(["POST"])
+def team_buzz(request, pk):
+    session = GameSession.objects.filter(is_active=True).select_related("active_team").get(pk=pk)
+    team_id = request.data.get("team_id")
+    if not transition_team(session.id, team_id, BUZZED):
+        return Response({"error": "That team can't buzz now"}, status=409)
+    won, session.active_team_id = claim_buzzer(session.id, team_id)
+    session.buzzer_locked = True
+    notify_room(
+        session.id, {"type": "team_status"},
+        transition=(team_id, BUZZED),
+        session={"active_team_id": team_id, "buzzer_locked": True} if won else None,
+    )
+    return Response(GameSessionSerializer(session).data)
+
+
+urlpatterns = [
+    path("api/sync/auth/team-login/", team_login),
+    path("api/sync/active-session/", get_active_session),
+    path("api/sync/sessions/<int:pk>/team_buzz/", team_buzz),
+    path("api/sync/answers/", AnswerViewSet.as_view({"post": "create"})),
+    path("", include("quiz_project.urls")),
+]
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_api.wire import CODECS
+
+from ._bench import make_room
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the cost of fanning one broadcast out to N sockets through "
+        "the channel layer: encode per socket vs encode once"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teams", type=int, default=8)
+        parser.add_argument("--sizes", default="10,50,100,400")
+        parser.add_argument("--broadcasts", type=int, default=200)
+        parser.add_argument("--codec", default="json", choices=sorted(CODECS))
+
+    def handle(self, *args, **options):
+        layer = get_channel_layer()
+        if layer is None:
+            raise CommandError("No channel layer is configured")
+        codec = CODECS[options["codec"]]
+        self.stdout.write(f"Channel layer: {type(layer).__name__}, codec: {codec.name}")
+        self.stdout.write("sockets  per-socket (ms)  encode-once (ms)  per-socket CPU  encode-once CPU")
+        for size in (int(n) for n in options["sizes"].split(",")):
+            per_socket, once = asyncio.run(
+                self.run_size(layer, codec, size, options["teams"], options["broadcasts"])
+            )
+            self.stdout.write(
+                f"{size:>7}  {per_socket[0]:>15.3f}  {once[0]:>16.3f}"
+                f"  {per_socket[1]:>14.3f}  {once[1]:>15.3f}"
+            )
+
+    async def run_size(self, layer, codec, size, teams, broadcasts):
+        # Fresh group per size so earlier sockets don't receive these.
+        room = make_room(teams, session_id=size)
+        room.codecs[codec.name] = size
+        payload = {"type": "game_state", **room.snapshot()}
+        channels = [await layer.new_channel() for _ in range(size)]
+        for channel in channels:
+            await layer.group_add(room.group_name, channel)
+
+        async def per_socket():
+            # What every consumer did before RoomState.group_send: the
+            # group carries the payload and each socket encodes its copy.
+            await layer.group_send(room.group_name, {"type": "game_state", "payload": payload})
+            messages = await asyncio.gather(*(layer.receive(channel) for channel in channels))
+            return [codec.encode(message["payload"]) for message in messages]
+
+        async def encode_once():
+            # GameConsumer.frame_message forwards the frame it is handed.
+            await room.group_send(payload)
+            messages = await asyncio.gather(*(layer.receive(channel) for channel in channels))
+            return [message["frames"][codec.name] for message in messages]
+
+        try:
+            return (
+                await self.measure(broadcasts, per_socket),
+                await self.measure(broadcasts, encode_once),
+            )
+        finally:
+            for channel in channels:
+                await layer.group_discard(room.group_name, channel)
+
+    async def measure(self, broadcasts, fan_out):
+        """Return ``(wall ms, CPU ms)`` per broadcast."""
+        start, start_cpu = time.perf_counter(), time.process_time()
+        for _ in range(broadcasts):
+            await fan_out()
+        return (
+            (time.perf_counter() - start) * 1000 / broadcasts,
+            (time.process_time() - start_cpu) * 1000 / broadcasts,
+        )
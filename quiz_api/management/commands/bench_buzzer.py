@@ -0,0 +1,54 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_api.buzzer import BuzzerEngine, receive_stamp
+
+from ._bench import make_room
+
+
+class Command(BaseCommand):
+    help = "Benchmark buzzer arbitration with many simultaneous buzzes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        clients = options["clients"]
+        rounds = options["rounds"]
+
+        room = make_room(clients)
+        # The benchmark never touches the database.
+        room.buzzer = BuzzerEngine(room, mode="memory")
+
+        asyncio.run(self.run_rounds(room, rounds))
+
+        stats = room.buzzer.stats()
+        self.stdout.write(
+            f"{clients} clients x {rounds} rounds: "
+            f"p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, "
+            f"max {stats['max_ms']} ms"
+        )
+        self.stdout.write(self.style.SUCCESS("Exactly one winner per round, queue in receive order"))
+
+    async def run_rounds(self, room, rounds):
+        async def buzz(team_id):
+            received_at, received_clock = receive_stamp()
+            return await room.buzzer.buzz(team_id, received_at, received_clock)
+
+        for _ in range(rounds):
+            room.next_question(None)
+            results = await asyncio.gather(*(buzz(team_id) for team_id in room.teams))
+
+            winners = [r for r in results if r["accepted"]]
+            queue = room.session.buzz_queue
+            if len(winners) != 1:
+                raise CommandError(f"{len(winners)} winners in one round")
+            if len(queue) != len(room.teams):
+                raise CommandError("Buzz queue lost entries")
+            if queue[0]["team"] != room.session.active_team_id:
+                raise CommandError("Winner is not the earliest buzz")
+            stamps = [entry["received_at"] for entry in queue]
+            if stamps != sorted(stamps):
+                raise CommandError("Buzz queue is not in receive order")
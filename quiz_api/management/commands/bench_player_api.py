@@ -0,0 +1,162 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from quiz_api import active_session
+from quiz_api.metrics import LatencyWindow
+from quiz_api.models import GameSession, Question, Team
+
+from ._bench import BENCH_ROUND, require_local_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare p50/p99 latency of the async player endpoints with their DRF "
+        "versions under many concurrent clients. Writes a throwaway session, "
+        "teams and questions to the configured database, which must be local, "
+        "and deletes them after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=4, help="Per client and endpoint")
+        parser.add_argument("--endpoints", default="login,active,buzz,answer")
+
+    def handle(self, *args, **options):
+        clients = options["clients"]
+        requests = options["requests"]
+        endpoints = options["endpoints"].split(",")
+        unknown = set(endpoints) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        # While it runs, the bench session is the newest active one for
+        # every worker on the same database.
+        require_local_database()
+
+        # Another active session must not be switched off by ours.
+        with override_settings(
+            ROOT_URLCONF="quiz_api.management.commands._bench_urls",
+            ALLOWED_HOSTS=["*"],
+            QUIZ_CONCURRENT_SESSIONS=True,
+        ):
+            session, teams, questions = self.make_data(clients, requests)
+            try:
+                asyncio.run(self.run(session, teams, questions, endpoints, requests))
+            finally:
+                session.delete()
+                Question.objects.filter(round=BENCH_ROUND).delete()
+                active_session.forget(session.id)
+
+    def make_data(self, clients, requests):
+        session = GameSession.objects.create(name="bench", is_active=True)
+        teams = Team.objects.bulk_create(
+            Team(name=f"Bench {i}", code=f"B{session.id}-{i}", session=session)
+            for i in range(clients)
+        )
+        # Every answer needs its own (team, question): one question per
+        # request and variant.
+        questions = Question.objects.bulk_create(
+            Question(round=BENCH_ROUND, order=i, question="bench", answer="bench")
+            for i in range(2 * requests)
+        )
+        if not all(team.id for team in teams) or not all(q.id for q in questions):
+            # Backends that don't return ids from bulk_create.
+            teams = list(Team.objects.filter(session=session).order_by("id"))
+            questions = list(Question.objects.filter(round=BENCH_ROUND).order_by("order"))
+        return session, teams, questions
+
+    async def run(self, session, teams, questions, endpoints, requests):
+        app = get_asgi_application()
+        self.stdout.write(f"{len(teams)} clients x {requests} requests each")
+        self.stdout.write("endpoint  version  p50 ms   p99 ms   max ms   req/s")
+        for endpoint in endpoints:
+            for variant, prefix in (("sync", "/api/sync/"), ("async", "/api/")):
+                scenario = SCENARIOS[endpoint]
+                window = LatencyWindow(size=len(teams) * requests)
+                failures = []
+
+                async def client(index):
+                    team = teams[index]
+                    for n in range(requests):
+                        question = questions[n + (requests if variant == "async" else 0)]
+                        method, path, body = scenario(session, team, question)
+                        start = time.perf_counter()
+                        status = await request(app, method, prefix + path, body)
+                        window.add(time.perf_counter() - start)
+                        if status >= 400:
+                            failures.append(status)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(client(index) for index in range(len(teams))))
+                elapsed = time.perf_counter() - start
+                stats = window.summary()
+                self.stdout.write(
+                    f"{endpoint:<8}  {variant:<7}  {stats['p50_ms']:>6}  {stats['p99_ms']:>7}  "
+                    f"{stats['max_ms']:>7}  {len(teams) * requests / elapsed:>6.0f}"
+                )
+                if failures:
+                    self.stderr.write(f"  {len(failures)} requests failed, e.g. HTTP {failures[0]}")
+                # Buzzer rounds start over for the next variant.
+                await sync_to_async(reset_buzzer)(session)
+
+
+def reset_buzzer(session):
+    GameSession.objects.filter(id=session.id).update(buzzer_locked=False, active_team=None)
+    Team.objects.filter(session=session).update(status="waiting")
+
+
+SCENARIOS = {
+    "login": lambda session, team, question: ("POST", "auth/team-login/", {"code": team.code}),
+    "active": lambda session, team, question: ("GET", "active-session/", None),
+    "buzz": lambda session, team, question: (
+        "POST", f"sessions/{session.id}/team_buzz/", {"team_id": team.id}
+    ),
+    "answer": lambda session, team, question: ("POST", "answers/", {
+        "team": team.id, "question": question.id, "session": session.id, "answer_text": "bench",
+    }),
+}
+
+
+async def request(app, method, path, body):
+    """Send one HTTP request straight to the ASGI app; return the status."""
+    data = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(data)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            # Nothing more will come; wait like a quiet client would.
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": data, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from quiz_api.affinity import RoomOwnedElsewhere
+from quiz_api.buzzer import BuzzerEngine, receive_stamp
+from quiz_api.models import Answer, GameSession, Question, Team
+from quiz_api.room import get_room
+
+from ._bench import BENCH_ROUND, make_room, require_local_database
+
+
+# Lease for --live runs when QUIZ_ROOM_LEASE isn't set.
+LIVE_LEASE = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test: game rounds per second as live rooms are added, in one or "
+        "more worker processes. With --live, rooms are loaded with get_room() "
+        "from throwaway sessions in the configured database, which must be "
+        "local, each worker holding the lease on its share, and they flush and "
+        "broadcast through the database and the channel layer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", default="1,2,4,8,16,32")
+        parser.add_argument("--workers", default="1,2,4")
+        parser.add_argument("--teams", type=int, default=20)
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument("--live", action="store_true")
+
+    def handle(self, *args, **options):
+        room_counts = [int(n) for n in options["rooms"].split(",")]
+        worker_counts = [int(n) for n in options["workers"].split(",")]
+        if max(worker_counts) > (os.cpu_count() or 1):
+            self.stderr.write(f"Only {os.cpu_count()} CPUs: more workers than that can't scale")
+
+        sessions = questions = None
+        if options["live"]:
+            require_local_database()
+            sessions, questions = make_data(max(room_counts), options["teams"], options["rounds"])
+        try:
+            self.run(room_counts, worker_counts, options, sessions, questions)
+        finally:
+            if sessions:
+                GameSession.objects.filter(id__in=sessions).delete()
+                Question.objects.filter(round=BENCH_ROUND).delete()
+
+    def run(self, room_counts, worker_counts, options, sessions, questions):
+        # Rooms share nothing, so CPU per round should stay flat as rooms
+        # are added and rounds/s should grow with workers, one per core.
+        self.stdout.write(
+            "workers  rooms  rounds/s  per room  ms CPU/round" + ("  refused" if sessions else "")
+        )
+        # Spawned, not forked: each worker names itself in the lease.
+        context = multiprocessing.get_context("spawn")
+        for workers in worker_counts:
+            # Each worker is a separate process holding its share of the
+            # rooms, as the room lease arranges for ASGI workers.
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=django.setup) as pool, \
+                    context.Manager() as manager:
+                list(pool.map(run_shard, [1] * workers, [options["teams"]] * workers, [1] * workers))
+                barrier = manager.Barrier(workers)
+                for rooms in room_counts:
+                    if rooms < workers:
+                        continue
+                    if sessions:
+                        shards = [sessions[i:rooms:workers] for i in range(workers)]
+                        # The rooms reload them; every answer has to be new.
+                        Answer.objects.filter(session_id__in=sessions).delete()
+                        results = list(pool.map(
+                            run_live_shard, shards, [sessions[:rooms]] * workers,
+                            [questions[:options["rounds"]]] * workers, [barrier] * workers,
+                        ))
+                    else:
+                        shards = [rooms // workers + (i < rooms % workers) for i in range(workers)]
+                        results = list(pool.map(
+                            run_shard, shards, [options["teams"]] * workers, [options["rounds"]] * workers,
+                        ))
+                    played = sum(result[0] for result in results)
+                    cpu = sum(result[1] for result in results)
+                    # Workers run side by side: done when the slowest is.
+                    elapsed = max(result[2] for result in results)
+                    line = (
+                        f"{workers:>7}  {rooms:>5}  {played / elapsed:>8.0f}  "
+                        f"{played / elapsed / rooms:>8.1f}  {cpu * 1000 / played:>12.3f}"
+                    )
+                    if sessions:
+                        # Every worker tries every room the others hold.
+                        refused = sum(result[3] for result in results)
+                        line += f"  {refused:>3}/{(workers - 1) * rooms}"
+                    self.stdout.write(line)
+
+
+def make_data(room_count, team_count, rounds):
+    """Create inactive sessions with teams, and questions to play."""
+    sessions = GameSession.objects.bulk_create(
+        GameSession(name=f"bench {i}") for i in range(room_count)
+    )
+    if not all(session.id for session in sessions):
+        # Backends that don't return ids from bulk_create.
+        sessions = list(GameSession.objects.filter(name__startswith="bench ").order_by("-id")[:room_count])
+    Team.objects.bulk_create(
+        Team(name=f"Bench {i}", code=f"R{session.id}-{i}", session=session)
+        for session in sessions for i in range(team_count)
+    )
+    Question.objects.bulk_create(
+        Question(round=BENCH_ROUND, order=i, question="bench", answer="bench")
+        for i in range(rounds)
+    )
+    questions = Question.objects.filter(round=BENCH_ROUND).order_by("order").values_list("id", flat=True)
+    return [session.id for session in sessions], list(questions)
+
+
+def run_shard(room_count, team_count, rounds):
+    """Play ``rounds`` in each of ``room_count`` rooms at once, in this
+    process; return ``(rounds played, CPU seconds, wall seconds)``."""
+    start, cpu_start = time.perf_counter(), time.process_time()
+    asyncio.run(_play(room_count, team_count, rounds))
+    return room_count * rounds, time.process_time() - cpu_start, time.perf_counter() - start
+
+
+async def _play(room_count, team_count, rounds):
+    rooms = []
+    for session_id in range(1, room_count + 1):
+        room = make_room(team_count, session_id)
+        room.session.created_at = timezone.now()
+        # Never touches the database or the channel layer.
+        room.buzzer = BuzzerEngine(room, mode="memory")
+        rooms.append(room)
+    await asyncio.gather(*(_play_room(room, rounds) for room in rooms))
+
+
+async def _play_room(room, rounds):
+    for question_id in range(1, rounds + 1):
+        room.next_question(question_id)
+        json.dumps(room.snapshot())
+        await _play_round(room)
+        json.dumps(room.snapshot())
+        json.dumps(room.leaderboard().top(10)[0])
+        # Nothing flushes here; drop what would have been written.
+        room.pending_answers.clear()
+        room.pending_scores.clear()
+        await asyncio.sleep(0)
+
+
+async def _play_round(room):
+    # What a buzzer round costs the worker: every team buzzes and answers
+    # and the winner scores. Callers publish before and after.
+    async def buzz(team_id):
+        received_at, received_clock = receive_stamp()
+        return await room.buzzer.buzz(team_id, received_at, received_clock)
+
+    await asyncio.gather(*(buzz(team_id) for team_id in room.teams))
+    for team_id in room.teams:
+        received_at, _ = receive_stamp()
+        room.submit_answer(team_id, f"answer {team_id}", received_at)
+    room.update_score(room.session.active_team_id, 10, "bench")
+
+
+def run_live_shard(session_ids, all_session_ids, question_ids, barrier):
+    """Hold the rooms of ``session_ids`` and play every question in each,
+    in this process; return ``(rounds played, CPU seconds, wall seconds,
+    rooms of other workers refused)``."""
+    with override_settings(QUIZ_ROOM_LEASE=settings.QUIZ_ROOM_LEASE or LIVE_LEASE):
+        start, cpu_start = time.perf_counter(), time.process_time()
+        refused = asyncio.run(_play_live(session_ids, all_session_ids, question_ids, barrier))
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    return len(session_ids) * len(question_ids), cpu, elapsed, refused
+
+
+async def _play_live(session_ids, all_session_ids, question_ids, barrier):
+    rooms = []
+    for session_id in session_ids:
+        room = await get_room(session_id)
+        # As a socket would: keeps it loaded, flushing and encoding frames.
+        room.join("json")
+        rooms.append(room)
+    # Only once every worker holds its rooms can the others be refused.
+    await asyncio.to_thread(barrier.wait)
+    refused = 0
+    for session_id in set(all_session_ids) - set(session_ids):
+        try:
+            await get_room(session_id)
+        except RoomOwnedElsewhere:
+            refused += 1
+    await asyncio.to_thread(barrier.wait)
+
+    async def play(room):
+        for question_id in question_ids:
+            room.next_question(question_id)
+            await room.broadcast_state()
+            await _play_round(room)
+            await room.broadcast_state()
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(play(room) for room in rooms))
+    for room in rooms:
+        # Flushes what is left and gives up the lease.
+        await room.leave("json")
+    return refused
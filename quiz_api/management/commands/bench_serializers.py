@@ -0,0 +1,80 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from quiz_api.models import Answer
+from quiz_api.serializers import (
+    AnswerSerializer, GameSessionSerializer, TeamSerializer,
+    serialize_answer_rows, serialize_session, serialize_team,
+)
+
+from ._bench import make_room
+
+
+class Command(BaseCommand):
+    help = "Compare DRF serializers with the fast paths for hot payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teams", type=int, default=30)
+        parser.add_argument("--answers", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=500)
+
+    def handle(self, *args, **options):
+        room = make_room(options["teams"])
+        room.session.created_at = timezone.now()
+        room.session.active_team = room.teams[1]
+        room.session.buzz_queue = [{"team": 1, "received_at": 1.5}]
+        teams = list(room.teams.values())
+
+        answers = [
+            Answer(
+                id=uuid.uuid4(), team=teams[i % len(teams)], question_id=1,
+                session_id=room.session_id, answer_text=f"answer {i}",
+                is_correct=(None, True, False)[i % 3], created_at=timezone.now(),
+            )
+            for i in range(options["answers"])
+        ]
+        # What ``values(*ANSWER_VALUES)`` returns for them.
+        rows = [
+            {
+                "id": a.id, "team": a.team_id, "team__name": a.team.name,
+                "question": a.question_id, "session": a.session_id,
+                "answer_text": a.answer_text, "is_correct": a.is_correct,
+                "points_awarded": a.points_awarded, "time_taken": a.time_taken,
+                "created_at": a.created_at,
+            }
+            for a in answers
+        ]
+
+        cases = [
+            ("session", lambda: GameSessionSerializer(room.session).data,
+             lambda: serialize_session(room.session)),
+            (f"{len(teams)} teams", lambda: TeamSerializer(teams, many=True).data,
+             lambda: [serialize_team(team) for team in teams]),
+            (f"{len(rows)} answers", lambda: AnswerSerializer(answers, many=True).data,
+             lambda: serialize_answer_rows(rows)),
+        ]
+
+        self.stdout.write("payload        DRF (ms)  fast (ms)  speedup")
+        for name, drf, fast in cases:
+            if _plain(drf()) != fast():
+                raise CommandError(f"{name}: fast output differs from DRF")
+            drf_ms = self.measure(options["repeat"], drf)
+            fast_ms = self.measure(options["repeat"], fast)
+            self.stdout.write(f"{name:<13} {drf_ms:>9.4f} {fast_ms:>10.4f} {drf_ms / fast_ms:>7.1f}x")
+        self.stdout.write(self.style.SUCCESS("Fast output identical to DRF"))
+
+    def measure(self, repeat, serialize):
+        start = time.process_time()
+        for _ in range(repeat):
+            serialize()
+        return (time.process_time() - start) * 1000 / repeat
+
+
+def _plain(data):
+    # ReturnDict/ReturnList -> dict/list, for comparison.
+    if isinstance(data, list):
+        return [dict(item) for item in data]
+    return dict(data)
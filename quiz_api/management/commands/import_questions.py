@@ -0,0 +1,218 @@
+import csv
+import json
+import string
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quiz_api.grading import forget_questions
+from quiz_api.models import Question
+from quiz_api.packs import forget_packs
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Import questions from CSV or JSON Lines files, streamed in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Files to import; '-' reads stdin")
+        parser.add_argument("--format", choices=["csv", "jsonl"],
+                            help="Default: from the file extension")
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument("--update", action="store_true",
+                            help="Overwrite questions already at the same (round, order)")
+        parser.add_argument("--strict", action="store_true",
+                            help="Abort and roll back on the first invalid row")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.counts = {"created": 0, "updated": 0, "skipped": 0, "invalid": 0}
+        # (round, order) of every question this run created or updated.
+        # Only these may be overwritten by a later row for the same slot;
+        # questions that were there before need --update.
+        self.written = set()
+        start = time.perf_counter()
+
+        try:
+            with transaction.atomic():
+                for path in options["paths"]:
+                    self.import_file(path)
+                if options["dry_run"]:
+                    transaction.set_rollback(True)
+        finally:
+            # bulk_create/bulk_update don't send the signals that do this.
+            forget_questions()
+            forget_packs()
+
+        elapsed = time.perf_counter() - start
+        rows = sum(self.counts.values())
+        summary = ", ".join(f"{count} {name}" for name, count in self.counts.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Dry run: ' if options['dry_run'] else ''}{summary} "
+            f"({rows} rows in {elapsed:.2f}s, {rows / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
+
+    def import_file(self, path):
+        file_format = self.options["format"] or path.rsplit(".", 1)[-1].lower()
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError(f"{path}: pass --format csv or --format jsonl")
+
+        handle = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            rows = read_csv(handle) if file_format == "csv" else read_jsonl(handle)
+            chunk_size = self.options["chunk_size"]
+            while True:
+                chunk = list(islice(self.validated(path, rows), chunk_size))
+                if not chunk:
+                    break
+                self.save_chunk(chunk)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+    def validated(self, path, rows):
+        for line, row in rows:
+            try:
+                yield clean_row(row)
+            except RowError as error:
+                message = f"{path}:{line}: {error}"
+                if self.options["strict"]:
+                    raise CommandError(message)
+                self.stderr.write(message)
+                self.counts["invalid"] += 1
+
+    def save_chunk(self, chunk):
+        # The last row for a slot wins and the earlier ones count as
+        # skipped, whether they share a chunk or not.
+        by_key = {question_key(question): question for question in chunk}
+        self.counts["skipped"] += len(chunk) - len(by_key)
+
+        existing = {
+            (round_number, order): question_id
+            for question_id, round_number, order in Question.objects.filter(
+                round__in={key[0] for key in by_key},
+                order__in={key[1] for key in by_key},
+            ).values_list("id", "round", "order")
+            if (round_number, order) in by_key
+        }
+
+        new = [question for key, question in by_key.items() if key not in existing]
+        Question.objects.bulk_create(new)
+        self.counts["created"] += len(new)
+
+        # A row for a slot an earlier chunk wrote supersedes that row,
+        # which then counts as skipped, as it would in the same chunk.
+        ours = existing.keys() & self.written
+        self.counts["skipped"] += len(ours)
+        if self.options["update"]:
+            self.counts["updated"] += len(existing) - len(ours)
+        else:
+            self.counts["skipped"] += len(existing) - len(ours)
+            existing = {key: existing[key] for key in ours}
+
+        changed = []
+        for key, question_id in existing.items():
+            question = by_key[key]
+            question.id = question_id
+            changed.append(question)
+        Question.objects.bulk_update(changed, ["question", "answer", "options"])
+        self.written.update(question_key(question) for question in new + changed)
+
+
+# Stands in for a value that didn't parse, so the error is reported by
+# clean_row with its line number like any other.
+_INVALID = object()
+
+
+def question_key(question):
+    return question.round, question.order
+
+
+def read_csv(handle):
+    """Yield ``(line, row)`` from a CSV with round, order, question, answer
+    and optional options columns. ``options`` is a JSON list/object, or
+    choices separated by ``|``."""
+    reader = csv.DictReader(handle)
+    missing = {"round", "order", "question", "answer"} - set(reader.fieldnames or [])
+    if missing:
+        raise CommandError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+    for row in reader:
+        options = (row.get("options") or "").strip()
+        if options and options[0] in "[{":
+            try:
+                options = json.loads(options)
+            except ValueError:
+                yield reader.line_num, {**row, "options": _INVALID}
+                continue
+        elif options:
+            options = [option.strip() for option in options.split("|")]
+        row["options"] = options or None
+        yield reader.line_num, row
+
+
+def read_jsonl(handle):
+    """Yield ``(line, row)`` from one JSON object per line."""
+    for line, text in enumerate(handle, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            row = _INVALID
+        yield line, row
+
+
+def clean_row(row):
+    """Return an unsaved Question for ``row`` or raise RowError."""
+    if not isinstance(row, dict):
+        raise RowError("not a JSON object")
+
+    def integer(name, minimum):
+        value = row.get(name)
+        if value in (None, ""):
+            raise RowError(f"'{name}' is required")
+        # int() would quietly truncate 2.7, or take True as 1.
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise RowError(f"'{name}' must be a whole number")
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise RowError(f"'{name}' must be a whole number")
+        if value < minimum:
+            raise RowError(f"'{name}' must be at least {minimum}")
+        return value
+
+    round_number = integer("round", minimum=1)
+    order = integer("order", minimum=0)
+
+    text = str(row.get("question") or "").strip()
+    answer = str(row.get("answer") or "").strip()
+    if not text:
+        raise RowError("'question' is required")
+    if not answer:
+        raise RowError("'answer' is required")
+    if len(answer) > Question._meta.get_field("answer").max_length:
+        raise RowError("'answer' is too long")
+
+    options = row.get("options")
+    if options is _INVALID:
+        raise RowError("'options' is not valid JSON")
+    if options in ("", [], {}):
+        options = None
+    if options is not None:
+        values = options.values() if isinstance(options, dict) else options
+        if not isinstance(options, (list, dict)) or not all(
+            isinstance(value, str) and value.strip() for value in values
+        ):
+            raise RowError("'options' must be a list or object of non-empty strings")
+        if isinstance(options, list) and len(options) > len(string.ascii_uppercase):
+            raise RowError("'options' has more than 26 choices")
+
+    return Question(round=round_number, order=order, question=text, answer=answer, options=options)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from quiz_api.ledger import replay_scores
+from quiz_api.models import Team
+
+
+class Command(BaseCommand):
+    help = "Check team scores against the score ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--session", type=int)
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="Overwrite mismatched team scores with the ledger total",
+        )
+
+    def handle(self, *args, **options):
+        expected = replay_scores(options["session"])
+        mismatched = [
+            team for team in Team.objects.filter(id__in=expected)
+            if team.score != expected[team.id]
+        ]
+
+        for team in mismatched:
+            self.stdout.write(f"{team.name}: score {team.score}, ledger {expected[team.id]}")
+            if options["fix"]:
+                # save() so the leaderboard and live rooms pick it up.
+                team.score = expected[team.id]
+                team.save(update_fields=["score"])
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS(f"{len(expected)} teams match the ledger"))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(mismatched)} teams"))
@@ -0,0 +1,22 @@
+from collections import deque
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latency samples, in seconds."""
+
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+            "p99_ms": round(samples[int(len(samples) * 0.99)] * 1000, 3),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
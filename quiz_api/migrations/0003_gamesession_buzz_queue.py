@@ -0,0 +1,18 @@
+# Generated by Django 5.0 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0002_accesscode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='buzz_queue',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
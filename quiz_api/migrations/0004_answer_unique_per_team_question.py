@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-18 05:44
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def delete_duplicate_answers(apps, schema_editor):
+    # Keep one answer per team and question, so the constraint can be
+    # added: an evaluated one if there is one, else the first submitted.
+    Answer = apps.get_model("quiz_api", "Answer")
+    duplicated = (
+        Answer.objects.order_by()
+        .values("team_id", "question_id")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for pair in duplicated:
+        answers = sorted(
+            Answer.objects.filter(team_id=pair["team_id"], question_id=pair["question_id"]),
+            key=lambda answer: (answer.is_correct is None, answer.created_at),
+        )
+        Answer.objects.filter(id__in=[answer.id for answer in answers[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0003_gamesession_buzz_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('team', 'question'), name='unique_answer_per_team_question'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0 on 2026-10-18 05:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    # Seed the ledger with each team's current score so replays add up.
+    Team = apps.get_model("quiz_api", "Team")
+    ScoreEvent = apps.get_model("quiz_api", "ScoreEvent")
+    ScoreEvent.objects.bulk_create(
+        ScoreEvent(
+            team_id=team_id,
+            session_id=session_id,
+            delta=score,
+            reason="opening balance",
+        )
+        for team_id, session_id, score in Team.objects.exclude(score=0).values_list(
+            "id", "session_id", "score"
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0004_answer_unique_per_team_question'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('answer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='quiz_api.answer')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz_api.gamesession')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_events', to='quiz_api.team')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0005_scoreevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['-created_at', '-id'], name='answer_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['session', '-created_at', '-id'], name='answer_session_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['question', '-created_at', '-id'], name='answer_question_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['team', '-created_at', '-id'], name='answer_team_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0006_answer_recent_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='room_lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='room_owner',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
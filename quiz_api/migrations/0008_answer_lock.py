@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-18 06:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0007_room_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='answers_locked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='question_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
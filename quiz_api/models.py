@@ -1,7 +1,11 @@
 import uuid
+from django.conf import settings
 from django.db import models, transaction
 
 
+LEASE_FIELDS = ("room_owner", "room_lease_until")
+
+
 class GameSession(models.Model):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=False)
@@ -21,20 +25,53 @@ class GameSession(models.Model):
     )
 
     buzzer_locked = models.BooleanField(default=False)
+    # Every buzz for the current question, in arrival order:
+    # [{"team": <id>, "received_at": <epoch ms>}, ...]
+    buzz_queue = models.JSONField(default=list, blank=True)
+    # Set when the current question's timer ran out; answers are refused.
+    answers_locked = models.BooleanField(default=False)
+    # When the current question was shown; answer times count from here.
+    question_started_at = models.DateTimeField(null=True, blank=True)
+    # The worker holding the live room, and until when (see affinity.py).
+    room_owner = models.CharField(max_length=255, blank=True, default="")
+    room_lease_until = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        session = super().from_db(db, field_names, values)
+        session._saved_is_active = session.__dict__.get("is_active")
+        return session
+
     def save(self, *args, **kwargs):
-        # If this session is being activated
-        if self.is_active:
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # The room lease is renewed behind this instance's back; don't
+            # write back the copy it was loaded with.
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in LEASE_FIELDS
+                and field.attname not in deferred
+            ]
+        # Saving an already active session (a buzzer toggle, a new question)
+        # leaves the others alone; only activating it deactivates them,
+        # unless sessions may run side by side.
+        self._activation_changed = self.is_active != getattr(self, "_saved_is_active", False)
+        if self.is_active and self._activation_changed and not settings.QUIZ_CONCURRENT_SESSIONS:
             with transaction.atomic():
-                # Deactivate all other sessions
                 GameSession.objects.exclude(pk=self.pk).update(is_active=False)
-
-        super().save(*args, **kwargs)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._saved_is_active = self.is_active
 
     def __str__(self):
         return self.name
 
+TEAM_STATUSES = ["waiting", "answering", "locked", "timeout", "buzzed"]
+
+
 class Team(models.Model):
     name = models.CharField(max_length=255)
     code = models.CharField(max_length=12, unique=True, blank=True)
@@ -110,11 +147,54 @@ class Answer(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["team", "question"],
+                name="unique_answer_per_team_question",
+            ),
+        ]
+        # Match AnswerViewSet's cursor order, alone and behind each filter,
+        # so the newest page is an index range scan at any table size.
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="answer_recent_idx"),
+            models.Index(fields=["session", "-created_at", "-id"], name="answer_session_recent_idx"),
+            models.Index(fields=["question", "-created_at", "-id"], name="answer_question_recent_idx"),
+            models.Index(fields=["team", "-created_at", "-id"], name="answer_team_recent_idx"),
+        ]
 
     def __str__(self):
         return f"{self.team.name} - {self.question.id}"
 
 
+class ScoreEvent(models.Model):
+    """One entry in the append-only score ledger.
+
+    ``Team.score`` is a running total of these, applied in ``id`` order
+    and never allowed below zero (see ``quiz_api.ledger``).
+    """
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.CASCADE,
+        related_name="score_events"
+    )
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE)
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=255, blank=True)
+    answer = models.ForeignKey(
+        Answer,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.team_id}: {self.delta:+d} ({self.reason})"
+
+
 class AdminCode(models.Model):
     code = models.CharField(max_length=50, unique=True)
     is_active = models.BooleanField(default=True)
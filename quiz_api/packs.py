@@ -0,0 +1,53 @@
+import hashlib
+import time
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+
+from .models import Question
+from .serializers import QuestionListSerializer, QuestionSerializer
+
+
+# Pre-rendered question lists, shared by all requests in the process.
+# Keyed by ``(round, admin)``; round None is every question. Rebuilt on
+# first use after a question is saved or deleted in this process (see
+# signals.py), or after the TTL for changes made elsewhere.
+_packs = {}
+
+
+class QuestionPack:
+    """One rendered list of questions and its content-hash ETag."""
+
+    __slots__ = ("body", "etag", "count", "built_at")
+
+    def __init__(self, body, count):
+        self.body = body
+        self.count = count
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        self.built_at = time.monotonic()
+
+
+def _build(round_number, admin):
+    questions = Question.objects.all()
+    if round_number is not None:
+        questions = questions.filter(round=round_number)
+    serializer = QuestionSerializer if admin else QuestionListSerializer
+    data = serializer(questions, many=True).data
+    if round_number is None:
+        # The shape the paginated list endpoint returns for a single page.
+        data = {"count": len(data), "next": None, "previous": None, "results": data}
+    return QuestionPack(JSONRenderer().render(data), len(questions))
+
+
+def get_pack(round_number, admin):
+    """Return the pack for a round (None for all questions); admins get
+    the variant with answers."""
+    key = (round_number, admin)
+    pack = _packs.get(key)
+    if pack is None or time.monotonic() - pack.built_at > settings.QUIZ_QUESTION_PACK_TTL:
+        pack = _packs[key] = _build(round_number, admin)
+    return pack
+
+
+def forget_packs():
+    _packs.clear()
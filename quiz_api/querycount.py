@@ -0,0 +1,156 @@
+import contextlib
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+# The QueryStats collecting for the current request or consumer action.
+# database_sync_to_async runs its function in a copy of the caller's
+# context, so queries made on worker threads are counted too.
+_current = contextvars.ContextVar("quiz_query_stats", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements", "parent")
+
+    def __init__(self, parent=None):
+        # Counts also go to the enclosing block, e.g. a request inside
+        # ``max_queries``.
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    @property
+    def ms(self):
+        return round(self.seconds * 1000, 2)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        while stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+            stats.statements.append(sql)
+            stats = stats.parent
+
+
+@receiver(connection_created)
+def _install(sender, connection, **kwargs):
+    # Django keeps one wrapper object per alias and thread and reconnects it,
+    # so only install once.
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextlib.contextmanager
+def count_queries():
+    """Count the queries run inside the block, on any thread it awaits."""
+    stats = QueryStats(_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def max_queries(budget):
+    """Fail with QueryBudgetExceeded if the block runs more than ``budget``
+    queries. For tests and benchmarks::
+
+        with max_queries(3):
+            client.get("/api/questions/")
+    """
+    with count_queries() as stats:
+        yield stats
+    check_budget(stats, budget, "block")
+
+
+def check_budget(stats, budget, label):
+    if budget is None or stats.count <= budget:
+        return
+    message = f"{label} ran {stats.count} queries, budget is {budget}"
+    if settings.QUIZ_QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(message + ":\n" + "\n".join(stats.statements))
+    logger.warning(message)
+
+
+def query_budget(budget):
+    """Declare the most queries a view or viewset action may run."""
+    def declare(view):
+        view.query_budget = budget
+        return view
+    return declare
+
+
+def _declared_budget(view_func, method):
+    budget = getattr(view_func, "query_budget", None)
+    # DRF viewsets: the budget sits on the action method.
+    actions = getattr(view_func, "actions", None)
+    if budget is None and actions and method.lower() in actions:
+        handler = getattr(view_func.cls, actions[method.lower()], None)
+        budget = getattr(handler, "query_budget", None)
+    return budget
+
+
+class QueryCountMiddleware:
+    """Count queries and DB time per request.
+
+    Logged at DEBUG, as a warning (or an error with
+    ``QUIZ_QUERY_BUDGET_STRICT``) past a view's ``@query_budget``, and with
+    ``QUIZ_QUERY_HEADERS`` sent back as ``X-DB-Queries``/``X-DB-Time-Ms``.
+    Runs sync or async to match the stack, so async views stay async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with count_queries() as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        with count_queries() as stats:
+            response = await self.get_response(request)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        logger.debug("%s %s: %d queries, %s ms", request.method, request.path, stats.count, stats.ms)
+        if settings.QUIZ_QUERY_HEADERS:
+            response["X-DB-Queries"] = str(stats.count)
+            response["X-DB-Time-Ms"] = str(stats.ms)
+        # Looked up here rather than in process_view, which Django would
+        # run on a worker thread in front of every async view. A view can
+        # also set ``request.query_budget`` itself.
+        budget = getattr(request, "query_budget", None)
+        if budget is None and request.resolver_match is not None:
+            budget = _declared_budget(request.resolver_match.func, request.method)
+        check_budget(stats, budget, f"{request.method} {request.path}")
+        return response
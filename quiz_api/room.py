@@ -0,0 +1,901 @@
+import asyncio
+import atexit
+import logging
+import time
+import uuid
+from collections import Counter, deque
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+
+from . import leaderboard as leaderboards
+from .affinity import RoomOwnedElsewhere, claim, held_elsewhere, release
+from .buzzer import BuzzerEngine, insert_buzz
+from .grading import grade_answers
+from .ledger import apply_score_entries
+from .models import Answer, GameSession, Team
+from .serializers import serialize_session, serialize_team
+from .statuses import WAITING, plan_transition, transition_error
+from .timer import RoundTimer
+from .wire import encode_frames
+
+
+# Team columns the room writes back as-is. Scores go through the ledger
+# instead; everything else on the rows is read once on load.
+TEAM_FIELDS = ["status"]
+
+# Errors worth retrying a flush after: the database is unreachable or
+# busy. Anything else means a value it will never take.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+# Seconds a REST buzz waits for the worker holding the room to arbitrate it.
+BUZZ_REPLY_TIMEOUT = 2.0
+
+logger = logging.getLogger(__name__)
+
+_rooms = {}
+
+
+class RoomState:
+    """In-memory copy of a GameSession and its teams.
+
+    Consumers mutate the room instead of the database and every broadcast
+    is answered from memory. Changed fields are written back in one batch
+    every ``QUIZ_ROOM_FLUSH_INTERVAL`` seconds, when the last socket leaves
+    the room and at process exit. The database stays authoritative: a room
+    is always loaded from it on first use, and reloaded once it has been
+    marked stale by a write that didn't go through the room.
+
+    With ``QUIZ_ROOM_LEASE`` a room lives in one worker at a time: loading
+    it claims a lease on the session, the flush loop renews it and the
+    last socket leaving gives it up.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = int(session_id)
+        self.session = None
+        self.closed = False
+        self.teams = {}
+        self.stale = False
+        self._snapshot = None
+        self.dirty_session = set()
+        self.dirty_teams = set()
+        self.pending_scores = []
+        self.pending_answers = []
+        self.answered = set()
+        # ``seq`` numbers every group broadcast. It restarts whenever the
+        # room is rebuilt, so clients resume against an ``epoch`` as well.
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.history = deque(maxlen=settings.QUIZ_REPLAY_BUFFER_SIZE)
+        self._sent_session = {}
+        self._sent_teams = {}
+        self._changed_session = False
+        self._changed_teams = set()
+        self.connections = 0
+        self.codecs = Counter()
+        self.buzzer = BuzzerEngine(self)
+        self.timer = RoundTimer(self)
+        self.counters = {
+            "broadcasts_requested": 0,
+            "broadcasts_sent": 0,
+            "broadcasts_merged": 0,
+            "loads": 0,
+            "load_waits": 0,
+            "snapshot_hits": 0,
+            "snapshot_misses": 0,
+        }
+        self._pending_broadcast = None
+        self._applied_events = deque(maxlen=64)
+        self._load_lock = asyncio.Lock()
+        self._flush_task = None
+        self._lease_renewed = 0.0
+
+    # =====================================
+    # LOADING
+    # =====================================
+
+    @property
+    def loaded(self):
+        return self.session is not None and not self.stale
+
+    async def load(self):
+        """Load the room from the database unless it already is.
+
+        Single-flight: when a reconnect storm hits a cold or stale room,
+        one caller runs the queries and the rest wait for its result.
+        Returns False if the session doesn't exist (any more).
+        """
+        if self.loaded:
+            return True
+        if self.closed:
+            return False
+        if self._load_lock.locked():
+            self.counters["load_waits"] += 1
+
+        async with self._load_lock:
+            if self.loaded:
+                return True
+            if self.closed:
+                return False
+            reloading = self.session is not None
+            if reloading:
+                # Our unflushed changes win over whatever made us stale.
+                self.stale = False
+                await self.flush()
+
+            self.counters["loads"] += 1
+            session, teams, answered = await database_sync_to_async(self._fetch)()
+            if session is None:
+                if reloading:
+                    await self._drop()
+                self.session = None
+                return False
+            self.session = session
+            self.teams = {team.id: team for team in teams}
+            self.answered = answered | {
+                (answer.team_id, answer.question_id) for answer in self.pending_answers
+            }
+            leaderboards.sync_teams(self.session_id, teams).live = True
+            self._link_active_team()
+            self._snapshot = None
+            self._sent_session = dict(self.session_data())
+            self._sent_teams = {
+                team["id"]: dict(team) for team in self.teams_data()
+            }
+
+        if reloading:
+            # Teams may have come or gone, which a patch can't express.
+            await self.publish({"type": "game_state", **self.snapshot()})
+            await self.publish_rank_changes()
+        return True
+
+    def _fetch(self):
+        claim(self.session_id)
+        self._lease_renewed = time.monotonic()
+        session = GameSession.objects.filter(id=self.session_id).first()
+        if not session:
+            return None, [], set()
+        teams = list(Team.objects.filter(session_id=self.session_id).order_by("id"))
+        # Read once here so that submissions never have to check first.
+        answered = set(
+            Answer.objects.filter(session_id=self.session_id).values_list(
+                "team_id", "question_id"
+            )
+        )
+        return session, teams, answered
+
+    async def _drop(self):
+        # The session was deleted under a live room: there is nothing left
+        # to write its changes to, so forget them and close its sockets.
+        self.closed = True
+        self._take_dirty()
+        self.timer.cancel()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if _rooms.get(self.session_id) is self:
+            del _rooms[self.session_id]
+        board = leaderboards.peek(self.session_id)
+        if board is not None:
+            board.live = False
+        await get_channel_layer().group_send(self.group_name, {"type": "room_closed"})
+
+    def _link_active_team(self):
+        # Point the FK at our in-memory row so serializing
+        # ``active_team.name`` never goes back to the database.
+        team = self.teams.get(self.session.active_team_id)
+        self.session.active_team = team
+
+    # =====================================
+    # MUTATIONS
+    # =====================================
+
+    def leaderboard(self):
+        board = leaderboards.peek(self.session_id)
+        if board is None:
+            board = leaderboards.sync_teams(self.session_id, list(self.teams.values()))
+            board.live = True
+        return board
+
+    def get_team(self, team_id):
+        return self.teams.get(_as_int(team_id))
+
+    def get_team_by_code(self, code):
+        for team in self.teams.values():
+            if team.code == code:
+                return team
+        return None
+
+    def _set_session(self, **fields):
+        for name, value in fields.items():
+            setattr(self.session, name, value)
+            self.dirty_session.add(name)
+        self._changed_session = True
+        self._snapshot = None
+        if "active_team_id" in fields:
+            self._link_active_team()
+
+    def _set_team(self, team, **fields):
+        for name, value in fields.items():
+            setattr(team, name, value)
+        if not fields.keys().isdisjoint(TEAM_FIELDS):
+            self.dirty_teams.add(team.id)
+        self._changed_teams.add(team.id)
+        self._snapshot = None
+
+    def update_score(self, team_id, points, reason=""):
+        team = self.get_team(team_id)
+        if not team:
+            return False
+        self._set_team(team, score=max(0, team.score + points))
+        self.pending_scores.append((team.id, points, reason))
+        self.leaderboard().update(team.id, team.score)
+        return True
+
+    def set_team_status(self, team_id, status):
+        """Move a team to ``status``; return an error or None."""
+        team = self.get_team(team_id)
+        if not team:
+            return "Unknown team"
+        error = transition_error(team.status, status)
+        if error:
+            return error
+        self._apply_transition(team.id, status)
+        return None
+
+    def _apply_transition(self, team_id, status):
+        statuses = {team.id: team.status for team in self.teams.values()}
+        changes = plan_transition(statuses, team_id, status)
+        for changed, new in changes.items():
+            self._set_team(self.teams[changed], status=new)
+        return changes
+
+    def next_question(self, question_id):
+        self._set_session(
+            current_question_id=question_id,
+            active_team_id=None,
+            buzzer_locked=False,
+            buzz_queue=[],
+            answers_locked=False,
+            question_started_at=timezone.now(),
+        )
+        # Every team may buzz again.
+        for team in self.teams.values():
+            if team.status != WAITING:
+                self._set_team(team, status=WAITING)
+
+    def lock_buzzer(self, team_id):
+        # Arbitration lives in BuzzerEngine; this only records the result.
+        self._set_session(active_team_id=team_id, buzzer_locked=True)
+
+    def expire_timer(self):
+        self._set_session(answers_locked=True)
+        if not self.session.buzzer_locked:
+            self._set_session(buzzer_locked=True)
+
+    def submit_answer(self, team_id, answer_text, received_at):
+        """Buffer an answer for the current question.
+
+        Returns ``(answer, error)``. ``time_taken`` is measured by the server,
+        in milliseconds since the question started.
+        """
+        team = self.get_team(team_id)
+        question_id = self.session.current_question_id
+        if team is None:
+            return None, "Unknown team"
+        if question_id is None:
+            return None, "No current question"
+        if self.session.answers_locked:
+            return None, "Answers are closed"
+        if (team.id, question_id) in self.answered:
+            return None, "Already answered"
+
+        started = self.session.question_started_at
+        time_taken = 0
+        if started is not None:
+            time_taken = max(0, round(received_at - started.timestamp() * 1000))
+        answer = Answer(
+            team_id=team.id,
+            question_id=question_id,
+            session_id=self.session_id,
+            answer_text=answer_text,
+            time_taken=time_taken,
+        )
+        self.answered.add((team.id, question_id))
+        self.pending_answers.append(answer)
+        return answer, None
+
+    def add_buzz(self, team_id, received_at):
+        # Always assign a new list: the last broadcast payload still holds
+        # a reference to the old one.
+        queue, position = insert_buzz(self.session.buzz_queue, team_id, received_at)
+        self._set_session(buzz_queue=queue)
+        return position
+
+    # =====================================
+    # SERIALIZATION
+    # =====================================
+
+    def session_data(self):
+        return serialize_session(self.session)
+
+    def teams_data(self):
+        return [serialize_team(team, code=False) for team in self.teams.values()]
+
+    def snapshot(self):
+        # The serialized rows are cached until the next mutation; the timer
+        # counts down on its own so it is always read fresh.
+        if self._snapshot is None:
+            self.counters["snapshot_misses"] += 1
+            self._snapshot = {
+                "session": self.session_data(),
+                "teams": self.teams_data(),
+            }
+        else:
+            self.counters["snapshot_hits"] += 1
+        return {
+            "epoch": self.epoch,
+            "seq": self.seq,
+            **self._snapshot,
+            "timer": self.timer.state(),
+        }
+
+    def take_patch(self):
+        """Return what changed since the last patch.
+
+        Only touched rows are re-serialized, and only fields whose value
+        differs from what clients last saw are included. A field that
+        disappeared from the payload is sent as None. Returns None when
+        nothing changed.
+        """
+        session = {}
+        if self._changed_session:
+            session = _diff(self._sent_session, self.session_data())
+        teams = []
+        for team_id in sorted(self._changed_teams):
+            data = serialize_team(self.teams[team_id], code=False)
+            changed = _diff(self._sent_teams.setdefault(team_id, {}), data)
+            if changed:
+                teams.append({"id": team_id, **changed})
+        self._changed_session = False
+        self._changed_teams = set()
+
+        if not session and not teams:
+            return None
+        return {"session": session, "teams": teams}
+
+    # =====================================
+    # BROADCAST
+    # =====================================
+
+    @property
+    def group_name(self):
+        return group_name(self.session_id)
+
+    async def publish(self, payload):
+        """Number ``payload`` with the next ``seq``, keep it for replay and
+        broadcast it."""
+        self.seq += 1
+        payload = {**payload, "seq": self.seq}
+        self.history.append(payload)
+        await self.group_send(payload)
+
+    def replay(self, epoch, seq):
+        """Return the broadcasts a client that last saw ``seq`` has missed.
+
+        Returns None when they can't be replayed (another epoch, or already
+        rolled out of ``history``) and the client needs a snapshot instead.
+        """
+        if epoch != self.epoch or seq is None or seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.history or self.history[0]["seq"] > seq + 1:
+            return None
+        return [payload for payload in self.history if payload["seq"] > seq]
+
+    async def group_send(self, payload):
+        # Encode once per wire format in use here rather than once per
+        # socket; GameConsumer.frame_message forwards its frame untouched.
+        names = [name for name, count in self.codecs.items() if count > 0]
+        await get_channel_layer().group_send(self.group_name, {
+            "type": "frame_message",
+            "frames": encode_frames(payload, names),
+        })
+
+    async def broadcast_state(self):
+        """Broadcast the room's changes to every socket.
+
+        With ``QUIZ_BROADCAST_COALESCE_MS`` set, the first request opens a
+        window of that length and any request arriving inside it is merged
+        into the single broadcast sent when the window closes.
+        """
+        self.counters["broadcasts_requested"] += 1
+        window = settings.QUIZ_BROADCAST_COALESCE_MS
+        if not window:
+            await self._send_state()
+            return
+
+        if self._pending_broadcast is not None:
+            self.counters["broadcasts_merged"] += 1
+            return
+        self._pending_broadcast = asyncio.create_task(
+            self._send_state_later(window / 1000)
+        )
+
+    async def _send_state_later(self, delay):
+        await asyncio.sleep(delay)
+        self._pending_broadcast = None
+        await self._send_state()
+
+    async def _send_state(self):
+        patch = self.take_patch()
+        if patch is None:
+            return
+
+        if settings.QUIZ_STATE_PATCHES:
+            payload = {"type": "game_state_patch", **patch}
+        else:
+            payload = {"type": "game_state", **self.snapshot()}
+
+        self.counters["broadcasts_sent"] += 1
+        await self.publish(payload)
+        await self.publish_rank_changes()
+
+    async def apply_event(self, event):
+        """Apply a ``notify_room`` event and publish it to the room.
+
+        Every socket in the group delivers the event, so it is applied
+        once per room. ``scores`` are database totals; deltas still
+        waiting to be flushed from here are added on top. A
+        ``transition`` has already been checked against the database.
+        With ``QUIZ_STATE_PATCHES`` the payload carries the changes as a
+        patch would; otherwise a ``game_state`` snapshot follows it.
+        """
+        if event["id"] in self._applied_events or self.closed:
+            return
+        self._applied_events.append(event["id"])
+        if event.get("reload"):
+            # load() broadcasts the snapshot and rank changes.
+            self.stale = True
+            await self.load()
+            return
+
+        pending = Counter()
+        for team_id, delta, *_ in self.pending_scores:
+            pending[team_id] += delta
+        changed = set()
+        for team_id, score in event["scores"]:
+            team = self.get_team(team_id)
+            if team is None:
+                continue
+            self._set_team(team, score=max(0, score + pending[team.id]))
+            self.leaderboard().update(team.id, team.score)
+            changed.add(team.id)
+        if event.get("transition"):
+            team = self.get_team(event["transition"][0])
+            if team is not None:
+                changed.update(self._apply_transition(team.id, event["transition"][1]))
+        if event.get("session"):
+            self._set_session(**event["session"])
+        if event.get("answered"):
+            # A later submission of the same answer is refused here rather
+            # than acknowledged and then dropped by the flush.
+            self.answered.add(tuple(event["answered"]))
+        if event["payload"] is None:
+            return
+
+        if not settings.QUIZ_STATE_PATCHES:
+            # Clients only follow game_state. The snapshot covers every
+            # change so far, so a later broadcast needn't repeat them;
+            # details such as evaluated answers still go out on their own.
+            self.take_patch()
+            if event["payload"].keys() - {"type"}:
+                await self.publish(event["payload"])
+            await self.publish({"type": "game_state", **self.snapshot()})
+            await self.publish_rank_changes()
+            return
+
+        # Sent here; a later patch doesn't need to repeat it.
+        session = {}
+        if event.get("session"):
+            session = _diff(self._sent_session, self.session_data())
+        teams = [
+            {"id": team_id, **_diff(
+                self._sent_teams.setdefault(team_id, {}), serialize_team(self.teams[team_id], code=False)
+            )}
+            for team_id in sorted(changed)
+        ]
+        await self.publish({**event["payload"], "session": session, "teams": teams})
+        await self.publish_rank_changes()
+
+    async def remote_buzz(self, event):
+        """Arbitrate a ``buzz_room`` buzz and reply to its sender."""
+        if event["id"] in self._applied_events or self.closed:
+            return
+        self._applied_events.append(event["id"])
+        result = await self.buzzer.buzz(event["team_id"], event["received_at"], time.perf_counter())
+        await self.broadcast_state()
+        await get_channel_layer().send(event["reply_to"], {
+            "type": "buzz_result",
+            "result": result,
+            "session": self.session_data(),
+        })
+
+    async def publish_rank_changes(self):
+        changes = self.leaderboard().rank_changes()
+        if changes:
+            await self.publish({"type": "leaderboard", "changes": changes})
+
+    def stats(self):
+        return {
+            **self.counters,
+            "connections": self.connections,
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "buzzer": self.buzzer.stats(),
+        }
+
+    # =====================================
+    # WRITE-BEHIND
+    # =====================================
+
+    def join(self, codec_name):
+        self.connections += 1
+        self.codecs[codec_name] += 1
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def leave(self, codec_name):
+        self.connections -= 1
+        self.codecs[codec_name] -= 1
+        if self.connections > 0:
+            return
+        # Nobody is left to see it run out.
+        self.timer.cancel()
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if not await self.flush():
+            # Keep the room, and its lease, until its changes are written.
+            self._flush_task = asyncio.create_task(self._flush_loop())
+            return
+        await self._close()
+
+    async def _close(self):
+        # Somebody may have joined while we were writing.
+        if self.connections <= 0 and _rooms.get(self.session_id) is self:
+            del _rooms[self.session_id]
+            board = leaderboards.peek(self.session_id)
+            if board is not None:
+                # Nothing keeps it current now.
+                board.live = False
+            await database_sync_to_async(release)(self.session_id)
+
+    async def _flush_loop(self):
+        interval = settings.QUIZ_ROOM_FLUSH_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                flushed = await self.flush()
+            except Exception:
+                logger.exception("Flushing room %s failed", self.session_id)
+                flushed = False
+            if flushed and self.connections <= 0:
+                # Left behind by leave() when its flush failed.
+                self._flush_task = None
+                await self._close()
+                return
+            if settings.QUIZ_ROOM_LEASE and (
+                time.monotonic() - self._lease_renewed > settings.QUIZ_ROOM_LEASE / 3
+            ):
+                await self.renew_lease()
+
+    async def renew_lease(self):
+        try:
+            await database_sync_to_async(claim)(self.session_id)
+            self._lease_renewed = time.monotonic()
+        except RoomOwnedElsewhere as error:
+            # Only if this worker stalled for a whole lease: two copies of
+            # the room now diverge until this one empties.
+            logger.error("Lost the lease on room %s to %s", self.session_id, error.owner)
+        except Exception:
+            logger.warning("Couldn't renew the lease on room %s", self.session_id, exc_info=True)
+
+    def _take_dirty(self):
+        batch = {
+            "session": {
+                name: getattr(self.session, name) for name in self.dirty_session
+            },
+            "teams": [
+                Team(id=team.id, status=team.status)
+                for team in (self.teams[team_id] for team_id in self.dirty_teams)
+            ],
+            "scores": self.pending_scores,
+            "answers": self.pending_answers,
+        }
+        self.dirty_session = set()
+        self.dirty_teams = set()
+        self.pending_scores = []
+        self.pending_answers = []
+        return batch
+
+    async def flush(self):
+        """Write the room's changes; return False if some are kept for
+        the next attempt."""
+        batch = self._take_dirty()
+        if not any(batch.values()):
+            return True
+        graded, unwritten = await database_sync_to_async(self._write_batch)(batch)
+        if unwritten:
+            self._restore(unwritten)
+        if graded:
+            await self.apply_grades(graded)
+        return not unwritten
+
+    def _restore(self, batch):
+        self.dirty_session.update(batch["session"])
+        self.dirty_teams.update(team.id for team in batch["teams"])
+        self.pending_scores[:0] = batch["scores"]
+        self.pending_answers[:0] = batch["answers"]
+
+    async def apply_grades(self, entries):
+        """Show auto-graded points in the room; the ledger already has them."""
+        for team_id, points, _, _ in entries:
+            team = self.get_team(team_id)
+            if team:
+                self._set_team(team, score=max(0, team.score + points))
+                self.leaderboard().update(team.id, team.score)
+        await self.broadcast_state()
+
+    async def flush_answers_if_full(self):
+        if len(self.pending_answers) >= settings.QUIZ_ANSWER_BATCH_SIZE:
+            await self.flush()
+
+    def _write(self, batch):
+        """Write a batch; return the ledger entries of auto-graded answers."""
+        ungraded, graded = [], []
+        if batch["answers"] and settings.QUIZ_AUTO_GRADE:
+            ungraded = [answer for answer in batch["answers"] if answer.is_correct is None]
+            graded = grade_answers(ungraded)
+        try:
+            with transaction.atomic():
+                if batch["session"]:
+                    # ``update()`` rather than ``save()``: no need to re-run the
+                    # single-active-session logic on every buzzer toggle.
+                    GameSession.objects.filter(id=self.session_id).update(**batch["session"])
+                if batch["teams"]:
+                    Team.objects.bulk_update(batch["teams"], TEAM_FIELDS)
+                if batch["answers"]:
+                    # The unique (team, question) constraint settles the rare
+                    # duplicate from another worker.
+                    Answer.objects.bulk_create(batch["answers"], ignore_conflicts=True)
+                if graded:
+                    # Only score answers that won that race.
+                    stored = set(Answer.objects.filter(
+                        id__in=[entry[3] for entry in graded]
+                    ).values_list("id", flat=True))
+                    graded = [entry for entry in graded if entry[3] in stored]
+                if batch["scores"] or graded:
+                    # Deltas, not totals: points given over REST meanwhile survive.
+                    apply_score_entries(batch["scores"] + graded)
+        except Exception:
+            # Nothing was stored or scored: grade them afresh next time,
+            # rather than store verdicts whose points were never booked.
+            for answer in ungraded:
+                answer.is_correct = None
+                answer.points_awarded = 0
+            raise
+        return graded
+
+    def _write_batch(self, batch):
+        """Write ``batch``; return ``(graded, unwritten)``.
+
+        On a transient error the whole batch comes back as ``unwritten``
+        to be tried again. Any other error would fail every retry and hold
+        up every later change of the room, so the batch is then written a
+        piece at a time and the pieces the database refuses are dropped.
+        """
+        try:
+            return self._write(batch), None
+        except TRANSIENT_ERRORS:
+            logger.warning("Couldn't flush room %s, will retry", self.session_id, exc_info=True)
+            return [], batch
+        except Exception:
+            logger.exception("Couldn't flush room %s, writing it piece by piece", self.session_id)
+
+        graded, unwritten = [], _empty_batch()
+        for piece in _pieces(batch):
+            try:
+                graded.extend(self._write(piece))
+            except TRANSIENT_ERRORS:
+                for key, value in piece.items():
+                    if key == "session":
+                        unwritten[key].update(value)
+                    else:
+                        unwritten[key].extend(value)
+            except Exception:
+                logger.exception("Dropped a change to room %s: %r", self.session_id, piece)
+        return graded, unwritten if any(unwritten.values()) else None
+
+    def flush_sync(self):
+        batch = self._take_dirty()
+        if any(batch.values()):
+            _, unwritten = self._write_batch(batch)
+            if unwritten:
+                logger.error("Lost unflushed changes of room %s: %r", self.session_id, unwritten)
+
+
+def _empty_batch():
+    return {"session": {}, "teams": [], "scores": [], "answers": []}
+
+
+def _pieces(batch):
+    # One session field, team, answer or score entry per batch. An answer
+    # keeps its grading, which is only scored once the answer is stored.
+    for name, value in batch["session"].items():
+        yield {**_empty_batch(), "session": {name: value}}
+    for team in batch["teams"]:
+        yield {**_empty_batch(), "teams": [team]}
+    for answer in batch["answers"]:
+        yield {**_empty_batch(), "answers": [answer]}
+    for entry in batch["scores"]:
+        yield {**_empty_batch(), "scores": [entry]}
+
+
+def _diff(sent, current):
+    # Updates ``sent`` in place to ``current`` and returns the difference.
+    changed = {
+        key: value for key, value in current.items()
+        if key not in sent or sent[key] != value
+    }
+    for key in sent.keys() - current.keys():
+        changed[key] = None
+    sent.clear()
+    sent.update(current)
+    return changed
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def group_name(session_id):
+    return f"quiz_game_{session_id}"
+
+
+def notify_room(session_id, payload, scores=(), transition=None, session=None, reload=False,
+                answered=None):
+    """Tell the live room of ``session_id``, in whichever worker holds it,
+    about a change made outside it.
+
+    ``scores`` are ``(team_id, total)`` pairs, ``transition`` a
+    ``(team_id, status)`` already applied with ``transition_team``,
+    ``session`` GameSession fields that were set and ``answered`` the
+    ``(team_id, question_id)`` of an answer that was stored. ``payload``
+    is broadcast with the resulting ``session`` and ``teams`` changes, or
+    nothing is when it is None. With ``reload``, for changes none of those
+    can express, the room reloads from the database and broadcasts a
+    snapshot instead. For sync callers: sent once the current transaction
+    commits, so the room never sees a change that was rolled back.
+    """
+    transaction.on_commit(lambda: async_to_sync(anotify_room)(
+        session_id, payload, scores, transition, session, reload, answered
+    ))
+
+
+async def anotify_room(session_id, payload, scores=(), transition=None, session=None, reload=False,
+                       answered=None):
+    try:
+        await get_channel_layer().group_send(group_name(session_id), {
+            "type": "room_event",
+            "id": uuid.uuid4().hex,
+            "scores": [list(pair) for pair in scores],
+            "transition": list(transition) if transition else None,
+            "session": session or {},
+            "answered": list(answered) if answered else None,
+            "reload": reload,
+            "payload": payload,
+        })
+    except Exception:
+        # The change is already stored; failing the request now would only
+        # invite a retry that applies it twice. A room held here reloads
+        # on its next use.
+        logger.warning("Couldn't notify room %s", session_id, exc_info=True)
+        mark_stale(session_id)
+
+
+async def buzz_room(session, team_id, received_at, received_clock):
+    """Arbitrate a buzz made over REST in the live room of ``session``,
+    in whichever worker holds it, so that it competes with the room's own
+    buzzes.
+
+    Returns ``(result, session data)`` like ``BuzzerEngine.buzz``, or
+    None when no worker holds the room and the database decides. Raises
+    asyncio.TimeoutError when the holder doesn't answer.
+    """
+    room = _rooms.get(session.id)
+    if room is not None and room.session is not None and await room.load():
+        result = await room.buzzer.buzz(team_id, received_at, received_clock)
+        await room.broadcast_state()
+        return result, room.session_data()
+    if not held_elsewhere(session):
+        return None
+
+    layer = get_channel_layer()
+    reply_to = await layer.new_channel()
+    await layer.group_send(group_name(session.id), {
+        "type": "room_buzz",
+        "id": uuid.uuid4().hex,
+        "team_id": team_id,
+        "received_at": received_at,
+        "reply_to": reply_to,
+    })
+    reply = await asyncio.wait_for(layer.receive(reply_to), BUZZ_REPLY_TIMEOUT)
+    return reply["result"], reply["session"]
+
+
+def mark_stale(session_id=None):
+    """Make the next use of a room reload it from the database.
+
+    Called from model signals, possibly on a sync worker thread, so it only
+    flips a flag. With no ``session_id`` every room is marked.
+    """
+    if session_id is None:
+        rooms = list(_rooms.values())
+    else:
+        rooms = [room for room in [_rooms.get(int(session_id))] if room]
+    for room in rooms:
+        room.stale = True
+
+
+async def get_room(session_id, active_only=False):
+    """Return the loaded room for ``session_id``.
+
+    Returns None if the session doesn't exist, or with ``active_only`` if
+    it isn't active. Raises RoomOwnedElsewhere if another worker holds
+    the room. Callers join the room before their next await, or it may
+    be dropped under them.
+    """
+    session_id = int(session_id)
+    while True:
+        room = _rooms.get(session_id)
+        if room is None:
+            room = _rooms[session_id] = RoomState(session_id)
+        found = False
+        try:
+            found = await room.load()
+        finally:
+            if not found and not room.connections and _rooms.get(session_id) is room:
+                del _rooms[session_id]
+        if not found:
+            return None
+        if _rooms.get(session_id) is room:
+            break
+        # Its last socket left while we waited for the load; a room that
+        # isn't in _rooms any more would never be flushed again.
+    if room.session.is_active or not active_only:
+        return room
+    if not room.connections and _rooms.get(session_id) is room:
+        del _rooms[session_id]
+        await database_sync_to_async(release)(session_id)
+    return None
+
+
+@atexit.register
+def flush_all_rooms():
+    for room in list(_rooms.values()):
+        if room.session is not None:
+            try:
+                room.flush_sync()
+                release(room.session_id)
+            except Exception:
+                logger.exception("Couldn't flush room %s at exit", room.session_id)
@@ -1,10 +1,14 @@
-from rest_framework import serializers
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Team, Question, GameSession, Answer, AdminCode
 
 class TeamSerializer(serializers.ModelSerializer):
     class Meta:
         model = Team
         fields = ['id', 'name', 'code', 'score', 'status']
+        # Scores only change through the ledger (see ledger.py).
+        read_only_fields = ['score']
 
 
 
@@ -28,13 +32,15 @@ class GameSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = GameSession
         fields = [
-            'id', 'current_round', 'current_question_index', 'active_team',
-            'active_team_name', 'timer_seconds', 'is_timer_running',
-            'round_type', 'buzzer_enabled', 'buzzer_order',
-            'question_revealed', 'game_started', 'is_active',
-            'created_at', 'updated_at'
+            'id', 'name', 'is_active', 'current_question', 'active_team',
+            'active_team_name', 'buzzer_locked', 'buzz_queue', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at']
+
+
+# What DRF's UniqueTogetherValidator says; it doesn't run for the
+# UniqueConstraint on Answer.
+ALREADY_ANSWERED = 'The fields team, question must make a unique set.'
 
 
 class AnswerSerializer(serializers.ModelSerializer):
@@ -47,4 +53,106 @@ class AnswerSerializer(serializers.ModelSerializer):
             'answer_text', 'is_correct', 'points_awarded',
             'time_taken', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+    def validate(self, attrs):
+        if 'team' in attrs or 'session' in attrs:
+            team = attrs['team'] if 'team' in attrs else self.instance.team
+            session_id = attrs['session'].id if 'session' in attrs else self.instance.session_id
+            if team.session_id != session_id:
+                raise serializers.ValidationError({'team': 'Team is not in this session'})
+        return attrs
+
+class PrimaryKeyValue(serializers.Field):
+    """PrimaryKeyRelatedField's input checks without its query: returns
+    the id, and whether the row exists is up to the caller."""
+    default_error_messages = serializers.PrimaryKeyRelatedField.default_error_messages
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class AnswerCreateSerializer(AnswerSerializer):
+    """AnswerSerializer's input checks for the async create view, which
+    looks ``team``, ``question`` and ``session`` up itself in one query."""
+    team = PrimaryKeyValue()
+    question = PrimaryKeyValue()
+    session = PrimaryKeyValue()
+    related = ('team', 'question', 'session')
+
+    def validate(self, attrs):
+        return attrs
+
+
+# Fast paths for the payloads sent on every broadcast or poll. They build
+# the same dicts as the serializers above from plain attribute access (or
+# ``values()`` rows); ``bench_serializers`` checks they still match.
+
+_datetime = serializers.DateTimeField()
+
+
+def _format_datetime(value, tz):
+    # DateTimeField.to_representation without its per-call timezone lookup.
+    if value is None or timezone.is_naive(value) or api_settings.DATETIME_FORMAT != ISO_8601:
+        return _datetime.to_representation(value)
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def serialize_team(team, code=True):
+    data = {'id': team.id, 'name': team.name}
+    # A team's code is its login. Room broadcasts reach every socket,
+    # viewers included, so they leave it out.
+    if code:
+        data['code'] = team.code
+    data['score'] = team.score
+    data['status'] = team.status
+    return data
+
+
+def serialize_session(session):
+    data = {
+        'id': session.id,
+        'name': session.name,
+        'is_active': session.is_active,
+        'current_question': session.current_question_id,
+        'active_team': session.active_team_id,
+    }
+    # Like the serializer, leave the key out when there is no active team.
+    if session.active_team_id is not None:
+        data['active_team_name'] = session.active_team.name
+    data['buzzer_locked'] = session.buzzer_locked
+    data['buzz_queue'] = session.buzz_queue
+    data['created_at'] = _format_datetime(session.created_at, timezone.get_current_timezone())
+    return data
+
+
+ANSWER_VALUES = (
+    'id', 'team', 'team__name', 'question', 'session', 'answer_text',
+    'is_correct', 'points_awarded', 'time_taken', 'created_at',
+)
+
+
+def serialize_answer_rows(rows):
+    """Serialize ``values(*ANSWER_VALUES)`` rows like AnswerSerializer."""
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            'id': str(row['id']),
+            'team': row['team'],
+            'team_name': row['team__name'],
+            'question': row['question'],
+            'session': row['session'],
+            'answer_text': row['answer_text'],
+            'is_correct': row['is_correct'],
+            'points_awarded': row['points_awarded'],
+            'time_taken': row['time_taken'],
+            'created_at': _format_datetime(row['created_at'], tz),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import active_session, leaderboard
+from .access import invalidate_codes
+from .grading import forget_questions
+from .models import AccessCode, AdminCode, GameSession, Question, Team
+from .packs import forget_packs
+from .room import mark_stale
+
+
+# Live rooms never write through save() or delete(), so anything arriving
+# here came from the REST API, the admin or a management command.
+
+
+def after_commit(func, *args):
+    # A room or cache reloaded before the transaction commits would read
+    # the old rows, and one that is rolled back changed nothing. Arguments
+    # are taken now: delete() clears the instance's pk afterwards.
+    transaction.on_commit(lambda: func(*args))
+
+
+@receiver(post_save, sender=GameSession)
+def game_session_saved(sender, instance, **kwargs):
+    # Fixtures are saved with save_base(), which skips GameSession.save()
+    # and the flag it sets; assume the worst.
+    if getattr(instance, "_activation_changed", True):
+        # Activating a session deactivates every other one with update(),
+        # unless sessions may run side by side.
+        stale = instance.pk
+        if instance.is_active and not settings.QUIZ_CONCURRENT_SESSIONS:
+            stale = None
+        after_commit(active_session.forget, stale)
+        after_commit(mark_stale, stale)
+    else:
+        if instance.is_active:
+            # The cached summary has the name.
+            after_commit(active_session.forget, None, False)
+        after_commit(mark_stale, instance.pk)
+
+
+@receiver(post_delete, sender=GameSession)
+def game_session_deleted(sender, instance, **kwargs):
+    if instance.is_active:
+        after_commit(active_session.forget, instance.pk)
+    after_commit(mark_stale, instance.pk)
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, **kwargs):
+    leaderboard.team_saved(instance)
+    after_commit(mark_stale, instance.session_id)
+
+
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    leaderboard.team_deleted(instance)
+    after_commit(mark_stale, instance.session_id)
+
+
+@receiver([post_save, post_delete], sender=AdminCode)
+@receiver([post_save, post_delete], sender=AccessCode)
+def access_code_changed(sender, **kwargs):
+    invalidate_codes()
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, **kwargs):
+    forget_questions()
+    forget_packs()
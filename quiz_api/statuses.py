@@ -0,0 +1,77 @@
+from django.db.models import Case, Exists, Q, Value, When
+
+from .models import TEAM_STATUSES, Team
+
+
+WAITING, ANSWERING, LOCKED, TIMEOUT, BUZZED = TEAM_STATUSES
+
+# {new status: statuses a team may move to it from}. Going back to
+# waiting is always allowed; setting the status a team already has is a
+# no-op rather than an error.
+TRANSITIONS = {
+    WAITING: frozenset(TEAM_STATUSES),
+    ANSWERING: frozenset({WAITING, BUZZED, ANSWERING}),
+    BUZZED: frozenset({WAITING, BUZZED}),
+    LOCKED: frozenset({WAITING, ANSWERING, BUZZED, LOCKED}),
+    TIMEOUT: frozenset({ANSWERING, TIMEOUT}),
+}
+
+
+def transition_error(current, status):
+    if status not in TRANSITIONS:
+        return f"Unknown status '{status}'"
+    if current not in TRANSITIONS[status]:
+        return f"Can't go from '{current}' to '{status}'"
+    return None
+
+
+def plan_transition(statuses, team_id, status):
+    """Return ``{team_id: status}`` for every team a transition changes,
+    given the session's current ``{team_id: status}``.
+
+    Only one team answers at a time: making a team ``answering`` sends
+    every other team that isn't waiting back to waiting.
+    """
+    changes = {team_id: status}
+    if status == ANSWERING:
+        for other, current in statuses.items():
+            if other != team_id and current != WAITING:
+                changes[other] = WAITING
+    return {
+        changed: new for changed, new in changes.items()
+        if statuses.get(changed) != new
+    }
+
+
+def _transition(session_id, team_id, status):
+    # The queryset and update() arguments that apply a transition.
+    legal = Team.objects.filter(
+        id=team_id, session_id=session_id, status__in=TRANSITIONS[status]
+    )
+    if status != ANSWERING:
+        return legal, {"status": status}
+
+    return Team.objects.filter(
+        Q(id=team_id) | ~Q(status=WAITING),
+        Exists(legal),
+        session_id=session_id,
+    ), {"status": Case(
+        When(id=team_id, then=Value(ANSWERING)),
+        default=Value(WAITING),
+    )}
+
+
+def transition_team(session_id, team_id, status):
+    """Move a team of ``session_id`` to ``status`` in one UPDATE.
+
+    The UPDATE only matches when the team is in the session and the move
+    is legal from the status it has at that moment, so a racing change
+    can't slip an illegal transition through. Returns False otherwise.
+    """
+    teams, fields = _transition(session_id, team_id, status)
+    return teams.update(**fields) > 0
+
+
+async def atransition_team(session_id, team_id, status):
+    teams, fields = _transition(session_id, team_id, status)
+    return await teams.aupdate(**fields) > 0
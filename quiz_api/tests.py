@@ -1,3 +1,338 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from .grading import (
+    AMBIGUOUS, CORRECT, WRONG, AnswerKey, edit_distance, forget_questions, grade_answers, normalize
+)
+from .ledger import apply_score_entries, replay_scores
+from .models import Answer, GameSession, Question, ScoreEvent, Team
+from .querycount import QueryBudgetExceeded, max_queries
+from .room import RoomState
+from .statuses import ANSWERING, BUZZED, LOCKED, TIMEOUT, WAITING, transition_team
+
+
+# Inside a test's transaction every atomic() block adds a SAVEPOINT and
+# a RELEASE, which are counted like any other statement.
+SAVEPOINT = 2
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(QUIZ_QUERY_BUDGET_STRICT=True)
+class MaxQueriesTests(TestCase):
+
+    def test_raises_over_budget(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with max_queries(1):
+                list(GameSession.objects.all())
+                list(Team.objects.all())
+
+    def test_counts_queries_in_budget(self):
+        with max_queries(1) as stats:
+            list(GameSession.objects.all())
+        self.assertEqual(stats.count, 1)
+
+
+@override_settings(QUIZ_QUERY_BUDGET_STRICT=True)
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.session = GameSession.objects.create(name="Ledger")
+        self.teams = [
+            Team.objects.create(name=f"Team {i}", session=self.session)
+            for i in range(20)
+        ]
+
+    def test_batch_is_three_queries_for_any_number_of_teams(self):
+        entries = [(team.id, 5, "round 1") for team in self.teams]
+        entries += [(team.id, -2, "penalty") for team in self.teams]
+        with max_queries(3 + SAVEPOINT):
+            totals = apply_score_entries(entries)
+
+        self.assertEqual({score for _, score in totals.values()}, {3})
+        self.assertEqual(ScoreEvent.objects.count(), 40)
+
+    def test_fold_matches_applying_entries_one_by_one(self):
+        team = self.teams[0]
+        entries = [(team.id, delta, "") for delta in (3, -10, 4, -1, 6)]
+        with max_queries(3 + SAVEPOINT):
+            totals = apply_score_entries(entries)
+
+        # max(0, ...) after each entry: 3, 0, 4, 3, 9
+        self.assertEqual(totals[team.id], (self.session.id, 9))
+        self.assertEqual(replay_scores(self.session.id)[team.id], 9)
+
+    def test_unknown_teams_are_skipped(self):
+        with max_queries(3 + SAVEPOINT):
+            totals = apply_score_entries([(self.teams[0].id, 5, ""), (999999, 5, "")])
+
+        self.assertEqual(list(totals), [self.teams[0].id])
+        self.assertEqual(ScoreEvent.objects.count(), 1)
+
+
+@override_settings(QUIZ_QUERY_BUDGET_STRICT=True)
+class StatusTransitionTests(TestCase):
+
+    def setUp(self):
+        self.session = GameSession.objects.create(name="Statuses")
+        self.other_session = GameSession.objects.create(name="Other")
+        self.teams = [
+            Team.objects.create(name=f"Team {i}", session=self.session)
+            for i in range(3)
+        ]
+
+    def statuses(self):
+        return list(
+            Team.objects.filter(session=self.session).order_by("id").values_list("status", flat=True)
+        )
+
+    def test_legal_transition_is_one_update(self):
+        with max_queries(1):
+            self.assertTrue(transition_team(self.session.id, self.teams[0].id, BUZZED))
+        self.assertEqual(self.statuses(), [BUZZED, WAITING, WAITING])
+
+    def test_answering_sends_the_others_back_in_the_same_update(self):
+        Team.objects.filter(id__in=[self.teams[1].id, self.teams[2].id]).update(status=LOCKED)
+        with max_queries(1):
+            self.assertTrue(transition_team(self.session.id, self.teams[0].id, ANSWERING))
+        self.assertEqual(self.statuses(), [ANSWERING, WAITING, WAITING])
+
+    def test_illegal_transition_changes_nothing(self):
+        with max_queries(1):
+            self.assertFalse(transition_team(self.session.id, self.teams[0].id, TIMEOUT))
+        self.assertEqual(self.statuses(), [WAITING, WAITING, WAITING])
+
+    def test_team_of_another_session_changes_nothing(self):
+        with max_queries(1):
+            self.assertFalse(transition_team(self.other_session.id, self.teams[0].id, ANSWERING))
+        self.assertEqual(self.statuses(), [WAITING, WAITING, WAITING])
+
+
+class GradingTests(TestCase):
+
+    def setUp(self):
+        forget_questions()
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  Café, au-Lait! "), "cafe au lait")
+
+    def test_edit_distance_stops_past_the_limit(self):
+        self.assertEqual(edit_distance("kitten", "sitting", 5), 3)
+        self.assertEqual(edit_distance("kitten", "sitting", 1), 2)
+        self.assertEqual(edit_distance("a", "abcdef", 2), 3)
+
+    def test_free_text(self):
+        key = AnswerKey("Paris | City of Light")
+        self.assertIs(key.grade("paris"), CORRECT)
+        self.assertIs(key.grade("City of light."), CORRECT)
+        self.assertIs(key.grade("Pariss"), CORRECT)
+        self.assertIs(key.grade("London"), WRONG)
+        self.assertIs(key.grade(""), WRONG)
+
+    def test_numbers_are_never_typos(self):
+        self.assertIs(AnswerKey("1066").grade("1067"), WRONG)
+
+    def test_near_misses_are_left_for_an_admin(self):
+        self.assertIs(AnswerKey("Jerusalem").grade("Jrslm"), AMBIGUOUS)
+
+    def test_multiple_choice(self):
+        key = AnswerKey("B", ["Red", "Blue", "Green"])
+        for submitted in ("b", "(b)", "Option B", "blue", "Bluee"):
+            self.assertIs(key.grade(submitted), CORRECT, submitted)
+        self.assertIs(key.grade("red"), WRONG)
+        self.assertIs(key.grade("option d"), AMBIGUOUS)
+
+    @override_settings(QUIZ_GRADING_POINTS=7)
+    def test_grade_answers(self):
+        question = Question.objects.create(question="Capital of France?", answer="Paris")
+        answers = [
+            Answer(team_id=1, question_id=question.id, answer_text=text)
+            for text in ("Paris", "Lyon", "Paaaris")
+        ]
+        entries = grade_answers(answers)
+
+        self.assertEqual([answer.is_correct for answer in answers], [True, False, None])
+        self.assertEqual([answer.points_awarded for answer in answers], [7, 0, 0])
+        self.assertEqual(entries, [(1, 7, "auto", answers[0].id)])
+
+
+class FlushTests(TestCase):
+
+    def setUp(self):
+        self.session = GameSession.objects.create(name="Flush")
+        self.team = Team.objects.create(name="Team", session=self.session)
+        self.room = RoomState(self.session.id)
+        self.room.session = self.session
+        self.room.teams = {self.team.id: self.team}
+
+    def test_refused_value_is_dropped_and_the_rest_written(self):
+        self.room._set_session(buzzer_locked="not a boolean")
+        self.room.update_score(self.team.id, 5)
+        self.room._set_team(self.team, status=BUZZED)
+
+        with self.assertLogs("quiz_api.room", "ERROR"):
+            graded, unwritten = self.room._write_batch(self.room._take_dirty())
+
+        self.assertEqual((graded, unwritten), ([], None))
+        self.team.refresh_from_db()
+        self.assertEqual((self.team.score, self.team.status), (5, BUZZED))
+
+    def test_transient_error_keeps_the_batch(self):
+        self.room.update_score(self.team.id, 5)
+        batch = self.room._take_dirty()
+        with mock.patch.object(self.room, "_write", side_effect=OperationalError), \
+                self.assertLogs("quiz_api.room", "WARNING"):
+            _, unwritten = self.room._write_batch(batch)
+        self.room._restore(unwritten)
+
+        self.assertEqual(self.room.pending_scores, [(self.team.id, 5, "")])
+        self.room._write_batch(self.room._take_dirty())
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.score, 5)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER, QUIZ_REPLAY_BUFFER_SIZE=2)
+class ReplayTests(SimpleTestCase):
+
+    def setUp(self):
+        self.room = RoomState(1)
+        self.room.session = GameSession(id=1, name="Replay", is_active=True)
+        self.room.teams = {1: Team(id=1, name="Team", code="REPLAY01", session_id=1)}
+        self.room.take_patch()
+        # What clients have seen so far.
+        self.room._sent_session = dict(self.room.session_data())
+        self.room._sent_teams = {1: dict(self.room.teams_data()[0])}
+
+    def publish(self, payload):
+        async_to_sync(self.room.publish)(payload)
+
+    def test_patch_has_only_what_changed(self):
+        self.assertIsNone(self.room.take_patch())
+        self.room._set_session(buzzer_locked=True)
+        self.room._set_team(self.room.teams[1], status=BUZZED)
+        self.assertEqual(self.room.take_patch(), {
+            "session": {"buzzer_locked": True},
+            "teams": [{"id": 1, "status": BUZZED}],
+        })
+        self.assertIsNone(self.room.take_patch())
+
+    def test_replays_what_was_missed(self):
+        self.publish({"type": "a"})
+        self.publish({"type": "b"})
+        self.assertEqual(
+            [payload["type"] for payload in self.room.replay(self.room.epoch, 1)], ["b"]
+        )
+        self.assertEqual(self.room.replay(self.room.epoch, 2), [])
+
+    def test_falls_back_to_a_snapshot(self):
+        for name in "abc":
+            self.publish({"type": name})
+        # Rolled out of the buffer, another epoch, or from the future.
+        self.assertIsNone(self.room.replay(self.room.epoch, 0))
+        self.assertIsNone(self.room.replay("other", 2))
+        self.assertIsNone(self.room.replay(self.room.epoch, 4))
+        self.assertIsNone(self.room.replay(self.room.epoch, None))
+
+
+class ImportQuestionsTests(TestCase):
+
+    def import_rows(self, rows, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as handle:
+            for row in rows:
+                handle.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+            handle.flush()
+            out = StringIO()
+            call_command("import_questions", handle.name, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_counts(self):
+        out = self.import_rows([
+            {"round": 1, "order": 1, "question": "Q1", "answer": "A1"},
+            {"round": 1, "order": 2, "question": "Q2", "answer": "A2", "options": ["A2", "B"]},
+            {"round": 1, "order": 2.5, "question": "Q3", "answer": "A3"},
+            "not json",
+        ])
+        self.assertIn("2 created, 0 updated, 0 skipped, 2 invalid", out)
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_existing_questions_need_update(self):
+        Question.objects.create(round=1, order=1, question="Old", answer="Old")
+        row = {"round": 1, "order": 1, "question": "New", "answer": "New"}
+
+        self.assertIn("0 created, 0 updated, 1 skipped", self.import_rows([row]))
+        self.assertEqual(Question.objects.get().question, "Old")
+        self.assertIn("0 created, 1 updated, 0 skipped", self.import_rows([row], "--update"))
+        self.assertEqual(Question.objects.get().question, "New")
+
+    def test_duplicates_resolve_the_same_at_any_chunk_size(self):
+        rows = [
+            {"round": 1, "order": 1, "question": "First", "answer": "A"},
+            {"round": 1, "order": 2, "question": "Kept?", "answer": "A"},
+            {"round": 1, "order": 1, "question": "Second", "answer": "A"},
+            {"round": 1, "order": 2, "question": "Kept?", "answer": "A"},
+        ]
+        for args in ([], ["--update"]):
+            results = []
+            for chunk_size in ("1", "500"):
+                Question.objects.all().delete()
+                Question.objects.create(round=1, order=2, question="Before", answer="A")
+                out = self.import_rows(rows, "--chunk-size", chunk_size, *args)
+                questions = dict(Question.objects.values_list("order", "question"))
+                results.append((out.split(" (")[0], questions))
+
+            self.assertEqual(results[0], results[1], args)
+            self.assertEqual(results[0][1][1], "Second")
+            # Without --update a question from before the run is never touched.
+            self.assertEqual(results[0][1][2], "Kept?" if args else "Before")
+
+    def test_dry_run_writes_nothing(self):
+        out = self.import_rows([{"round": 1, "order": 1, "question": "Q", "answer": "A"}], "--dry-run")
+        self.assertIn("Dry run: 1 created", out)
+        self.assertFalse(Question.objects.exists())
+
+
+# database_sync_to_async closes connections, which a TestCase's
+# transaction doesn't survive.
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class TeamBuzzTests(TransactionTestCase):
+
+    def setUp(self):
+        self.session = GameSession.objects.create(name="Buzz", is_active=True)
+        self.teams = [
+            Team.objects.create(name=f"Team {i}", session=self.session)
+            for i in range(3)
+        ]
+
+    def buzz(self, team):
+        return self.client.post(
+            f"/api/sessions/{self.session.id}/team_buzz/", {"team_id": team.id},
+            content_type="application/json",
+        )
+
+    def test_buzzes_without_a_room_are_queued_in_time_order(self):
+        first, second, third = self.teams
+        self.assertEqual(self.buzz(first).json()["active_team"], first.id)
+        response = self.buzz(second).json()
+        self.assertEqual(response["active_team"], first.id)
+        self.assertEqual([entry["team"] for entry in response["buzz_queue"]], [first.id, second.id])
+        # Buzzing again keeps the team's place.
+        self.assertEqual(len(self.buzz(first).json()["buzz_queue"]), 2)
+
+        Team.objects.filter(id=third.id).update(status=LOCKED)
+        self.assertEqual(self.buzz(third).status_code, 409)
+
+        self.session.refresh_from_db()
+        queue = self.session.buzz_queue
+        self.assertEqual([entry["team"] for entry in queue], [first.id, second.id])
+        self.assertLessEqual(queue[0]["received_at"], queue[1]["received_at"])
+        self.assertEqual((self.session.active_team_id, self.session.buzzer_locked), (first.id, True))
+        self.assertEqual(
+            list(Team.objects.order_by("id").values_list("status", flat=True)), [BUZZED, BUZZED, LOCKED]
+        )
@@ -0,0 +1,96 @@
+import asyncio
+import math
+import time
+
+from django.conf import settings
+
+
+# Longest countdown a room accepts.
+MAX_SECONDS = 60 * 60
+
+
+class RoundTimer:
+    """Server-side countdown for a room.
+
+    Clients are told when the timer starts, pauses, resumes, stops and
+    expires, each time with the wall-clock ``deadline`` (epoch ms), and
+    count down locally between events. Optional ``tick`` events are sent
+    every ``QUIZ_TIMER_TICK_INTERVAL`` seconds for clients that can't.
+    When the countdown reaches zero the buzzer and answers are locked.
+    """
+
+    def __init__(self, room):
+        self.room = room
+        self.remaining = 0.0
+        self.deadline = None
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    def state(self):
+        remaining = self.remaining
+        if self.running:
+            remaining = max(0.0, self.deadline - time.time())
+        return {
+            "running": self.running,
+            "seconds": math.ceil(remaining),
+            "deadline": round(self.deadline * 1000) if self.running else None,
+        }
+
+    async def start(self, seconds):
+        self.cancel()
+        self.remaining = float(seconds)
+        self._run()
+        await self._announce("start")
+
+    async def pause(self):
+        if not self.running:
+            return
+        self.remaining = max(0.0, self.deadline - time.time())
+        self.cancel()
+        await self._announce("pause")
+
+    async def resume(self):
+        if self.running or self.remaining <= 0:
+            return
+        self._run()
+        await self._announce("resume")
+
+    async def stop(self):
+        self.cancel()
+        self.remaining = 0.0
+        await self._announce("stop")
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _run(self):
+        self.deadline = time.time() + self.remaining
+        self._task = asyncio.create_task(self._countdown())
+
+    async def _countdown(self):
+        tick = settings.QUIZ_TIMER_TICK_INTERVAL
+        while True:
+            left = self.deadline - time.time()
+            if left <= 0:
+                break
+            await asyncio.sleep(min(left, tick) if tick else left)
+            if tick and self.deadline - time.time() > 0:
+                await self._announce("tick")
+
+        self._task = None
+        self.remaining = 0.0
+        self.room.expire_timer()
+        await self._announce("expired")
+        await self.room.broadcast_state()
+
+    async def _announce(self, event):
+        await self.room.publish({
+            "type": "timer",
+            "event": event,
+            **self.state()
+        })
@@ -11,6 +11,10 @@ urlpatterns = [
     path("auth/admin-login/", views.admin_login),
     path("active-session/", get_active_session),
     path("session/active/", views.ActiveSessionView),
+    path("sessions/<int:session_id>/leaderboard/", views.leaderboard),
+    # Async ahead of the routers' viewset routes for the same paths.
+    path("sessions/<int:pk>/team_buzz/", views.team_buzz),
+    path("answers/", views.answers),
 ]
 
 urlpatterns += router.urls
\ No newline at end of file
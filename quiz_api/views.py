@@ -1,21 +1,102 @@
+import asyncio
+import uuid
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render
 from rest_framework import viewsets, status
 from rest_framework import permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.shortcuts import get_object_or_404
-from .models import Team, Question, GameSession, Answer, AdminCode
+from . import active_session
+from .access import is_admin_code
+from .actions import Field, compile_schema
+from .asyncapi import async_api_view, json_response
+from .buzzer import CANT_BUZZ, receive_stamp, record_buzz
+from .grading import grade_answers
+from .leaderboard import get_leaderboard, reset_leaderboards
+from .ledger import apply_score_entries
+from .packs import get_pack
+from .querycount import query_budget
+from .room import anotify_room, buzz_room, notify_room
+from .statuses import ANSWERING, BUZZED, transition_error, transition_team
+from .models import Team, Question, GameSession, Answer, TEAM_STATUSES
 from .serializers import (
     TeamSerializer, QuestionSerializer, QuestionListSerializer,
-    GameSessionSerializer, AnswerSerializer
+    GameSessionSerializer, AnswerSerializer, AnswerCreateSerializer, ANSWER_VALUES, ALREADY_ANSWERED,
+    serialize_answer_rows, serialize_session, serialize_team,
 )
 
+validate_score_update = compile_schema({
+    'points': Field(int, required=False),
+    'reason': Field(str, required=False),
+})
+
+validate_verdict = compile_schema({
+    'answer': Field(str),
+    'is_correct': Field((bool, type(None))),
+    'points': Field(int, required=False),
+})
+
+
+def grade_answer(answer):
+    """Grade a new answer submitted over REST and score it."""
+    entries = grade_answers([answer])
+    if answer.is_correct is not None:
+        answer.save(update_fields=['is_correct', 'points_awarded'])
+        apply_scores(entries)
+
+
+def apply_scores(entries):
+    """Apply ledger entries from a REST view and tell live rooms."""
+    totals = apply_score_entries(entries)
+    by_session = {}
+    for team_id, (session_id, score) in totals.items():
+        by_session.setdefault(session_id, []).append((team_id, score))
+    for session_id, scores in by_session.items():
+        notify_room(session_id, {'type': 'team_scores'}, scores)
+    return totals
+
+
+def int_param(params, name):
+    """Return ``params[name]`` as an int, None if absent."""
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: 'Must be a number'})
+
+
+class FilterParamsMixin:
+    """Narrow the queryset by the ``filter_params`` given, e.g. ``?session=``"""
+    filter_params = ()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        filters = {}
+        for name in self.filter_params:
+            value = int_param(self.request.query_params, name)
+            if value is not None:
+                filters[f'{name}_id'] = value
+        return queryset.filter(**filters)
+
+
 # Custom permission for admin
 class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         admin_code = request.headers.get('X-Admin-Code')
-        return AdminCode.objects.filter(code=admin_code, is_active=True).exists()
+        return is_admin_code(admin_code)
 
 
 # Authentication Views
@@ -26,59 +107,115 @@ def admin_login(request):
     if not code:
         return Response({"error": "Code required"}, status=400)
 
-    exists = AdminCode.objects.filter(code=code, is_active=True).exists()
-
-    if exists:
+    if is_admin_code(code):
         return Response({"success": True})
 
     return Response({"success": False}, status=401)
 
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def team_login(request):
+# The player endpoints hit hardest at the start of a game and on every
+# buzzer round are async (see asyncapi.py): a login storm then waits on
+# the database, not on free worker threads.
+
+@query_budget(1)
+@async_api_view(['POST'])
+async def team_login(request):
     """Verify team code"""
     code = request.data.get('code')
     try:
-        team = Team.objects.get(code=code)
-        return Response({
+        team = await Team.objects.aget(code=code)
+        return json_response({
             'success': True,
-            'team': TeamSerializer(team).data
+            'team': serialize_team(team)
         })
     except Team.DoesNotExist:
-        return Response({'success': False, 'message': 'Invalid team code'}, status=400)
+        return json_response({'success': False, 'message': 'Invalid team code'}, status=400)
 
 
 # Team ViewSet
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(FilterParamsMixin, viewsets.ModelViewSet):
     queryset = Team.objects.all().order_by("id")
     serializer_class = TeamSerializer
     permission_classes = [AllowAny]
+    filter_params = ('session',)
     
     @action(detail=True, methods=['post'])
     def update_score(self, request, pk=None):
         """Update team score"""
         team = self.get_object()
+        error = validate_score_update(request.data)
+        if error:
+            return Response({'error': error}, status=400)
         points = request.data.get('points', 0)
-        team.score = max(0, team.score + points)
-        team.save()
+        apply_scores([(team.id, points, request.data.get('reason', 'manual'))])
+        team.refresh_from_db(fields=['score'])
         return Response(TeamSerializer(team).data)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin])
+    def scores(self, request):
+        """Apply many score changes in one transaction (admin only)
+
+        Body: {"entries": [{"team": 1, "delta": 5, "reason": "..."}, ...]}
+        """
+        entries = request.data.get('entries')
+        if not isinstance(entries, list) or not all(
+            isinstance(entry, dict)
+            and isinstance(entry.get('team'), int)
+            and isinstance(entry.get('delta'), int)
+            for entry in entries
+        ):
+            return Response({'error': 'entries must be a list of {team, delta, reason}'}, status=400)
+
+        totals = apply_scores([
+            (entry['team'], entry['delta'], str(entry.get('reason', '')))
+            for entry in entries
+        ])
+        return Response({
+            'teams': [
+                {'id': team_id, 'score': score}
+                for team_id, (_, score) in sorted(totals.items())
+            ]
+        })
     
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         """Update team status"""
         team = self.get_object()
         status = request.data.get('status')
-        if status in ['waiting', 'answering', 'locked', 'timeout', 'buzzed']:
-            team.status = status
-            team.save()
-            return Response(TeamSerializer(team).data)
-        return Response({'error': 'Invalid status'}, status=400)
+        if status not in TEAM_STATUSES:
+            return Response({'error': 'Invalid status'}, status=400)
+        if not transition_team(team.session_id, team.id, status):
+            team.refresh_from_db(fields=['status'])
+            error = transition_error(team.status, status) or 'Team status changed, try again'
+            return Response({'error': error}, status=409)
+
+        team.status = status
+        notify_room(team.session_id, {'type': 'team_status'}, transition=(team.id, status))
+        return Response(TeamSerializer(team).data)
     
     @action(detail=False, methods=['post'])
     def reset_all(self, request):
-        """Reset all teams (admin only)"""
-        Team.objects.all().update(score=0, status='waiting')
+        """Reset all teams of ``session`` (admin only)"""
+        session_id = int_param(request.data, 'session') or int_param(request.query_params, 'session')
+        if session_id is None and settings.QUIZ_CONCURRENT_SESSIONS:
+            # Don't wipe every venue's scores by leaving it out.
+            return Response({'error': 'session is required'}, status=400)
+        teams = Team.objects.all()
+        if session_id is not None:
+            teams = teams.filter(session_id=session_id)
+        session_ids = set(teams.values_list('session_id', flat=True).distinct())
+
+        with transaction.atomic():
+            # Zeroed through the ledger so the reset shows up in the audit trail.
+            apply_score_entries([
+                (team_id, -score, 'reset')
+                for team_id, score in teams.exclude(score=0).values_list('id', 'score')
+            ])
+            teams.update(status='waiting')
+            for reset_session_id in session_ids:
+                notify_room(reset_session_id, {'type': 'reset'}, reload=True)
+        # update() skips the signals that keep these in sync.
+        reset_leaderboards(session_id)
         return Response({'success': True})
 
 
@@ -95,29 +232,48 @@ class QuestionViewSet(viewsets.ModelViewSet):
     
     def is_admin(self, request):
         admin_code = request.headers.get('X-Admin-Code')
-        return AdminCode.objects.filter(code=admin_code, is_active=True).exists()
+        return is_admin_code(admin_code)
+
+    def pack_response(self, request, pack):
+        if request.headers.get('If-None-Match') == pack.etag:
+            return HttpResponseNotModified(headers={'ETag': pack.etag})
+        return HttpResponse(pack.body, content_type='application/json', headers={'ETag': pack.etag})
+
+    @query_budget(3)
+    def list(self, request, *args, **kwargs):
+        # Served pre-rendered while everything fits on the first page.
+        if 'page' not in request.query_params:
+            pack = get_pack(None, self.is_admin(request))
+            if pack.count <= self.paginator.page_size:
+                return self.pack_response(request, pack)
+        return super().list(request, *args, **kwargs)
     
+    @query_budget(3)
     @action(detail=False, methods=['get'])
     def by_round(self, request):
         """Get questions filtered by round"""
         round_num = request.query_params.get('round')
-        if round_num:
-            questions = self.queryset.filter(round=round_num)
-            serializer = self.get_serializer(questions, many=True)
-            return Response(serializer.data)
-        return Response({'error': 'Round parameter required'}, status=400)
+        if not round_num:
+            return Response({'error': 'Round parameter required'}, status=400)
+        try:
+            round_num = int(round_num)
+        except ValueError:
+            return Response({'error': 'Round must be a number'}, status=400)
+        return self.pack_response(request, get_pack(round_num, self.is_admin(request)))
 
 
 # Game Session ViewSet
 class GameSessionViewSet(viewsets.ModelViewSet):
-    queryset = GameSession.objects.filter(is_active=True)
+    queryset = GameSession.objects.filter(is_active=True).select_related('active_team')
     serializer_class = GameSessionSerializer
     permission_classes = [AllowAny]
     
+    @query_budget(2)
     @action(detail=False, methods=['get'])
     def current(self, request):
-        """Get current active game session"""
-        session = GameSession.objects.filter(is_active=True).first()
+        """Get current active game session, or active ``?session=``"""
+        active = active_session.current(int_param(request.query_params, 'session'))
+        session = active and self.get_queryset().filter(id=active.id).first()
         if session:
             return Response(GameSessionSerializer(session).data)
         return Response({'error': 'No active session'}, status=404)
@@ -164,35 +320,65 @@ class GameSessionViewSet(viewsets.ModelViewSet):
         """Set active team"""
         session = self.get_object()
         team_id = request.data.get('team_id')
+        if team_id is not None and not isinstance(team_id, int):
+            return Response({'error': 'team_id must be a number'}, status=400)
         if team_id:
+            # Every other team of this session goes back to waiting in
+            # the same UPDATE.
+            with transaction.atomic():
+                if not transition_team(session.id, team_id, ANSWERING):
+                    return Response({'error': "That team can't answer now"}, status=409)
+                GameSession.objects.filter(id=session.id).update(active_team_id=team_id)
+                notify_room(
+                    session.id, {'type': 'team_status'},
+                    transition=(team_id, ANSWERING), session={'active_team_id': team_id},
+                )
             session.active_team_id = team_id
-            session.save()
-            # Update team statuses
-            Team.objects.all().update(status='waiting')
-            Team.objects.filter(id=team_id).update(status='answering')
-        return Response(GameSessionSerializer(session).data)
-    
-    @action(detail=True, methods=['post'])
-    def team_buzz(self, request, pk=None):
-        """Team buzzes in"""
-        session = self.get_object()
-        team_id = request.data.get('team_id')
-        
-        if session.buzzer_enabled and team_id not in session.buzzer_order:
-            session.buzzer_order.append(team_id)
-            if len(session.buzzer_order) == 1:
-                session.active_team_id = team_id
-            session.save()
-            Team.objects.filter(id=team_id).update(status='buzzed')
-            
         return Response(GameSessionSerializer(session).data)
 
+    # POST <id>/team_buzz/ is the async team_buzz view below.
+
+
+class AnswerCursorPagination(CursorPagination):
+    # Newest first. No COUNT(*) and no OFFSET: each page continues from the
+    # last row of the previous one, using the Answer indexes.
+    ordering = ('-created_at', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
 
 # Answer ViewSet
-class AnswerViewSet(viewsets.ModelViewSet):
-    queryset = Answer.objects.all()
+class AnswerViewSet(FilterParamsMixin, viewsets.ModelViewSet):
+    queryset = Answer.objects.select_related('team')
     serializer_class = AnswerSerializer
     permission_classes = [AllowAny]
+    pagination_class = AnswerCursorPagination
+    filter_params = ('session', 'question', 'team')
+
+    @query_budget(2)
+    def list(self, request, *args, **kwargs):
+        # values() rows straight into dicts; the same JSON AnswerSerializer
+        # gives, without building a model and a serializer per row.
+        rows = self.paginate_queryset(self.get_queryset().values(*ANSWER_VALUES))
+        return self.get_paginated_response(serialize_answer_rows(rows))
+
+    def perform_create(self, serializer):
+        answer = self.save_answer(serializer)
+        notify_room(answer.session_id, None, answered=(answer.team_id, answer.question_id))
+        if settings.QUIZ_AUTO_GRADE and answer.is_correct is None:
+            grade_answer(answer)
+
+    def perform_update(self, serializer):
+        self.save_answer(serializer)
+
+    def save_answer(self, serializer):
+        # A second answer from the same team to the same question.
+        try:
+            with transaction.atomic():
+                return serializer.save()
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': [ALREADY_ANSWERED]})
     
     @action(detail=True, methods=['post'])
     def evaluate(self, request, pk=None):
@@ -200,42 +386,250 @@ class AnswerViewSet(viewsets.ModelViewSet):
         answer = self.get_object()
         is_correct = request.data.get('is_correct')
         points = request.data.get('points', 0)
-        
-        answer.is_correct = is_correct
-        answer.points_awarded = points
-        answer.save()
-        
-        # Update team score
-        if is_correct:
-            answer.team.score += points
-        else:
-            answer.team.score = max(0, answer.team.score + points)  # points can be negative
-        answer.team.save()
-        
+        if not isinstance(points, int) or isinstance(points, bool):
+            return Response({'error': 'points must be a number'}, status=400)
+
+        with transaction.atomic():
+            # Re-evaluating scores only the difference, like evaluate_bulk;
+            # the lock keeps two evaluations from booking it twice.
+            previous = Answer.objects.select_for_update().values_list(
+                'points_awarded', flat=True
+            ).get(id=answer.id)
+            answer.is_correct = is_correct
+            answer.points_awarded = points
+            answer.save(update_fields=['is_correct', 'points_awarded'])
+            # Points can be negative
+            entries = []
+            if points != previous:
+                entries.append((answer.team_id, points - previous, 'answer', answer.id))
+            totals = apply_score_entries(entries)
+
+        notify_room(
+            answer.session_id,
+            {'type': 'answers_evaluated', 'question_id': answer.question_id, 'answers': [{
+                'id': str(answer.id),
+                'team': answer.team_id,
+                'is_correct': answer.is_correct,
+                'points_awarded': answer.points_awarded,
+            }]},
+            [(team_id, score) for team_id, (_, score) in totals.items()],
+        )
         return Response(AnswerSerializer(answer).data)
 
+    @query_budget(11)
+    @action(detail=False, methods=['post'], url_path='evaluate-bulk',
+            permission_classes=[IsAdmin])
+    def evaluate_bulk(self, request):
+        """Evaluate every submission to a question at once (admin only)
 
-@api_view(["GET"])
-def get_active_session(request):
-    session = GameSession.objects.filter(is_active=True).first()
+        Body: {"question": 1, "verdicts": [{"answer": "<id>", "is_correct": true, "points": 10}, ...]}
+
+        The same handful of queries however many answers there are.
+        Re-evaluating an answer scores only the difference, and live rooms
+        get one ``answers_evaluated`` broadcast per session.
+        """
+        question_id = request.data.get('question')
+        verdicts = request.data.get('verdicts')
+        if not isinstance(question_id, int) or not isinstance(verdicts, list):
+            return Response({'error': 'question and verdicts are required'}, status=400)
+        by_id = {}
+        for verdict in verdicts:
+            error = validate_verdict(verdict) if isinstance(verdict, dict) else 'bad verdict'
+            if not error:
+                try:
+                    by_id[uuid.UUID(str(verdict['answer']))] = verdict
+                except ValueError:
+                    error = "'answer' is not an answer id"
+            if error:
+                return Response({'error': error}, status=400)
+
+        with transaction.atomic():
+            answers = list(
+                Answer.objects.select_for_update()
+                .filter(question_id=question_id, id__in=by_id)
+                .only('id', 'team_id', 'session_id', 'points_awarded')
+            )
+            entries = []
+            for answer in answers:
+                verdict = by_id[answer.id]
+                points = verdict.get('points', 0)
+                if points != answer.points_awarded:
+                    entries.append((answer.team_id, points - answer.points_awarded, 'answer', answer.id))
+                answer.is_correct = verdict['is_correct']
+                answer.points_awarded = points
+            Answer.objects.bulk_update(answers, ['is_correct', 'points_awarded'])
+            totals = apply_score_entries(entries)
+
+        results = {}
+        for answer in answers:
+            results.setdefault(answer.session_id, []).append({
+                'id': str(answer.id),
+                'team': answer.team_id,
+                'is_correct': answer.is_correct,
+                'points_awarded': answer.points_awarded,
+            })
+        for session_id, evaluated in results.items():
+            notify_room(
+                session_id,
+                {'type': 'answers_evaluated', 'question_id': question_id, 'answers': evaluated},
+                [(team_id, score) for team_id, (session, score) in totals.items() if session == session_id],
+            )
+
+        found = {answer.id for answer in answers}
+        return Response({
+            'question': question_id,
+            'answers': [row for evaluated in results.values() for row in evaluated],
+            'teams': [
+                {'id': team_id, 'score': score}
+                for team_id, (_, score) in sorted(totals.items())
+            ],
+            'missing': [str(answer_id) for answer_id in by_id if answer_id not in found],
+        })
+
+
+@query_budget(1)
+@async_api_view(["GET"])
+async def get_active_session(request):
+    session = await active_session.acurrent(int_param(request.query_params, 'session'))
 
     if not session:
-        return Response({"error": "No active session"}, status=404)
+        return json_response({"error": "No active session"}, status=404)
 
-    return Response({
-        "id": session.id,
-        "name": session.name,
-    })
+    return json_response(session.as_dict())
 
 
-@api_view(["GET"])
-def ActiveSessionView(request):
-    session = GameSession.objects.filter(is_active=True).first()
+@query_budget(1)
+@async_api_view(["GET"])
+async def ActiveSessionView(request):
+    session = await active_session.acurrent(int_param(request.query_params, 'session'))
 
     if not session:
-        return Response({"error": "No active session"}, status=404)
+        return json_response({"error": "No active session"}, status=404)
+
+    return json_response(session.as_dict())
+
+
+# SQLite logs the BEGIN of record_buzz's transaction as a query.
+@query_budget(6)
+@async_api_view(["POST"])
+async def team_buzz(request, pk):
+    """Team buzzes in"""
+    received_at, received_clock = receive_stamp()
+    session = await GameSession.objects.filter(is_active=True, pk=pk).select_related('active_team').afirst()
+    if session is None:
+        return json_response({'detail': 'Not found.'}, status=404)
+    team_id = request.data.get('team_id')
+    if not isinstance(team_id, int):
+        return json_response({'error': 'team_id must be a number'}, status=400)
+
+    # A live room holds the buzzer in memory; it has to decide.
+    try:
+        live = await buzz_room(session, team_id, received_at, received_clock)
+    except asyncio.TimeoutError:
+        return json_response({'error': 'The room is busy, try again'}, status=503)
+    if live is not None:
+        result, data = live
+        if result.get('error'):
+            return json_response({'error': result['error']}, status=409)
+        return json_response(data)
+
+    # The first team to buzz gets the buzzer.
+    recorded = await database_sync_to_async(record_buzz)(session.id, team_id, received_at)
+    if recorded is None:
+        return json_response({'error': CANT_BUZZ}, status=409)
+    won, session.active_team_id, session.buzz_queue = recorded
+    session.buzzer_locked = True
+    if session.active_team_id is not None and not GameSession.active_team.is_cached(session):
+        # Serializing would load it lazily, which async code can't.
+        session.active_team = await Team.objects.aget(id=session.active_team_id)
+    changed = {'buzz_queue': session.buzz_queue}
+    if won:
+        changed.update(active_team_id=team_id, buzzer_locked=True)
+    await anotify_room(
+        session.id, {'type': 'team_status'}, transition=(team_id, BUZZED), session=changed,
+    )
+    return json_response(serialize_session(session))
+
+
+_answer_list = AnswerViewSet.as_view({'get': 'list'})
+
+
+@csrf_exempt
+async def answers(request):
+    """Submitting is async; listing stays on AnswerViewSet."""
+    if request.method == 'POST':
+        return await create_answer(request)
+    # The middleware looked for a budget on this function.
+    request.query_budget = AnswerViewSet.list.query_budget
+    return await sync_to_async(_answer_list)(request)
+
+
+@async_api_view(['POST'])
+async def create_answer(request):
+    """AnswerViewSet.create without the thread: same body, checks and
+    response, with the team, question and session found in one query."""
+    serializer = AnswerCreateSerializer(data=request.data)
+    serializer.is_valid()
+    errors = dict(serializer.errors)
+    ids = {
+        name: serializer.fields[name].to_internal_value(serializer.initial_data[name])
+        for name in AnswerCreateSerializer.related if name not in errors
+    }
+
+    team = None
+    if 'team' in ids:
+        team = await Team.objects.filter(id=ids['team']).annotate(
+            question_found=Exists(Question.objects.filter(id=ids.get('question'))),
+            session_found=Exists(GameSession.objects.filter(id=ids.get('session'))),
+        ).afirst()
+    if team is not None:
+        found = {'team': True, 'question': team.question_found, 'session': team.session_found}
+    else:
+        # Error path only: check the other two on their own.
+        found = {'team': False}
+        for name, model in (('question', Question), ('session', GameSession)):
+            if name in ids:
+                found[name] = await model.objects.filter(id=ids[name]).aexists()
+    for name in ids:
+        if not found[name]:
+            pk = serializer.initial_data[name]
+            errors[name] = [serializer.fields[name].error_messages['does_not_exist'].format(pk_value=pk)]
+    if errors:
+        return json_response({name: errors[name] for name in serializer.fields if name in errors}, status=400)
+    if team.session_id != ids['session']:
+        return json_response({'team': ['Team is not in this session']}, status=400)
+
+    fields = {
+        name: value for name, value in serializer.validated_data.items()
+        if name not in AnswerCreateSerializer.related
+    }
+    answer = Answer(team=team, question_id=ids['question'], session_id=ids['session'], **fields)
+    try:
+        await answer.asave()
+    except IntegrityError:
+        return json_response({'non_field_errors': [ALREADY_ANSWERED]}, status=400)
+    await anotify_room(answer.session_id, None, answered=(team.id, answer.question_id))
+    if settings.QUIZ_AUTO_GRADE and answer.is_correct is None:
+        await database_sync_to_async(grade_answer)(answer)
+    return json_response(AnswerSerializer(answer).data, status=201)
+
+
+@query_budget(2)
+@api_view(["GET"])
+def leaderboard(request, session_id):
+    """Live ranking for a session: ``?top=k`` for the best k teams."""
+    board = get_leaderboard(session_id)
+    if board is None:
+        return Response({"error": "Session not found"}, status=404)
+
+    top = request.query_params.get("top")
+    try:
+        top = int(top) if top else None
+    except ValueError:
+        return Response({"error": "top must be a number"}, status=400)
+
+    if request.headers.get("If-None-Match") == board.etag:
+        return Response(status=304, headers={"ETag": board.etag})
 
-    return Response({
-        "id": session.id,
-        "name": session.name,
-    })
\ No newline at end of file
+    rows, etag = board.top(top)
+    return Response({"session": session_id, "teams": rows}, headers={"ETag": etag})
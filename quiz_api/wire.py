@@ -0,0 +1,88 @@
+import json
+from urllib.parse import parse_qs
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Clients pick an encoding with the "quiz.<name>" WebSocket subprotocol or
+# a ``?format=<name>`` query param. Plain JSON is the default.
+SUBPROTOCOL_PREFIX = "quiz."
+
+
+class JsonCodec:
+    name = "json"
+    binary = False
+
+    def encode(self, payload):
+        return json.dumps(payload)
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """Compact JSON text frames, encoded with orjson."""
+
+    name = "orjson"
+    binary = False
+
+    def encode(self, payload):
+        return orjson.dumps(payload).decode()
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack in binary frames."""
+
+    name = "msgpack"
+    binary = True
+
+    def encode(self, payload):
+        return msgpack.packb(payload, use_bin_type=True)
+
+    def decode(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        return msgpack.unpackb(data, raw=False)
+
+
+DEFAULT_CODEC = JsonCodec()
+
+CODECS = {DEFAULT_CODEC.name: DEFAULT_CODEC}
+if orjson is not None:
+    CODECS[OrjsonCodec.name] = OrjsonCodec()
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def negotiate(scope):
+    """Return ``(codec, subprotocol)`` for a connecting socket.
+
+    ``subprotocol`` is the one to echo back in the handshake, or None when
+    the client asked through the query string or not at all. Unknown or
+    unavailable formats fall back to JSON.
+    """
+    for subprotocol in scope.get("subprotocols", []):
+        if subprotocol.startswith(SUBPROTOCOL_PREFIX):
+            codec = CODECS.get(subprotocol[len(SUBPROTOCOL_PREFIX):])
+            if codec is not None:
+                return codec, subprotocol
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    name = query.get("format", [DEFAULT_CODEC.name])[0]
+    return CODECS.get(name, DEFAULT_CODEC), None
+
+
+def encode_frames(payload, names):
+    """Encode ``payload`` once for each codec name in ``names``."""
+    return {name: CODECS[name].encode(payload) for name in names}
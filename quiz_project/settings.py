@@ -54,7 +54,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'quiz_api.querycount.QueryCountMiddleware',
+    'quiz_api.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -152,6 +153,83 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Seconds between write-behind flushes of live room state to the database.
+QUIZ_ROOM_FLUSH_INTERVAL = float(os.environ.get("QUIZ_ROOM_FLUSH_INTERVAL", "1.0"))
+
+# "memory" arbitrates buzzes inside the worker that holds the room;
+# "database" also claims the buzzer with a conditional UPDATE, so a room
+# that two workers briefly both hold (a lease that ran out while its
+# worker stalled) still crowns one winner. It doesn't let several workers
+# serve one room: each would number and encode the room's broadcasts on
+# its own, so with several workers set QUIZ_ROOM_LEASE either way.
+QUIZ_BUZZER_ARBITRATION = os.environ.get("QUIZ_BUZZER_ARBITRATION", "memory")
+
+# Seconds between ``tick`` messages from the round timer. 0 sends only
+# start/pause/resume/stop/expired events and clients count down locally.
+QUIZ_TIMER_TICK_INTERVAL = float(os.environ.get("QUIZ_TIMER_TICK_INTERVAL", "0"))
+
+# Merge game state broadcasts requested within this many milliseconds of
+# each other into one. 0 broadcasts every change immediately.
+QUIZ_BROADCAST_COALESCE_MS = float(os.environ.get("QUIZ_BROADCAST_COALESCE_MS", "0"))
+
+# Recent broadcasts each room keeps for replay to reconnecting clients.
+QUIZ_REPLAY_BUFFER_SIZE = int(os.environ.get("QUIZ_REPLAY_BUFFER_SIZE", "256"))
+
+# WebSocket frames larger than this are rejected before decoding.
+QUIZ_MAX_FRAME_BYTES = int(os.environ.get("QUIZ_MAX_FRAME_BYTES", "8192"))
+
+# Buffered WebSocket answers are bulk-inserted once this many are waiting,
+# or at the next room flush, whichever comes first.
+QUIZ_ANSWER_BATCH_SIZE = int(os.environ.get("QUIZ_ANSWER_BATCH_SIZE", "50"))
+
+# Seconds each process trusts its cached admin/access codes. Changes made
+# in the same process take effect immediately.
+QUIZ_ACCESS_CODE_TTL = float(os.environ.get("QUIZ_ACCESS_CODE_TTL", "60"))
+
+# Broadcast ``game_state_patch`` deltas instead of the full game state.
+# Clients always get a full ``game_state`` on connect and on ``resync``.
+QUIZ_STATE_PATCHES = os.environ.get("QUIZ_STATE_PATCHES", "false").lower() == "true"
+
+# Grade submitted answers against ``Question.answer``/``options`` as they
+# are stored. Answers the grader isn't sure about are left for an admin.
+QUIZ_AUTO_GRADE = os.environ.get("QUIZ_AUTO_GRADE", "false").lower() == "true"
+
+# Points for an auto-graded correct answer.
+QUIZ_GRADING_POINTS = int(os.environ.get("QUIZ_GRADING_POINTS", "10"))
+
+# Most typos forgiven in a free-text answer (at most one per four letters;
+# never in answers containing digits).
+QUIZ_GRADING_MAX_EDITS = int(os.environ.get("QUIZ_GRADING_MAX_EDITS", "2"))
+
+# Seconds each process serves its pre-rendered question lists before
+# rebuilding them. Question edits in the same process take effect at once.
+QUIZ_QUESTION_PACK_TTL = float(os.environ.get("QUIZ_QUESTION_PACK_TTL", "300"))
+
+# Seconds a worker serves a leaderboard without reloading it, unless it
+# holds the session's live room, which keeps the board current.
+QUIZ_LEADERBOARD_TTL = float(os.environ.get("QUIZ_LEADERBOARD_TTL", "2"))
+
+# Let several sessions be live at once, e.g. one per venue. Off keeps one
+# active session: activating a session deactivates the others.
+QUIZ_CONCURRENT_SESSIONS = os.environ.get("QUIZ_CONCURRENT_SESSIONS", "false").lower() == "true"
+
+# Seconds a worker's claim on a live room lasts without renewal. With
+# several ASGI workers, the proxy should hash WebSocket paths so all
+# sockets of a session reach the same worker; the claim refuses sockets
+# that reach another. 0 (for a single worker) skips claiming.
+QUIZ_ROOM_LEASE = float(os.environ.get("QUIZ_ROOM_LEASE", "0"))
+
+# Seconds workers may serve a cached active session without checking the
+# database. Activation changes are also announced over the channel layer.
+QUIZ_ACTIVE_SESSION_TTL = float(os.environ.get("QUIZ_ACTIVE_SESSION_TTL", "30"))
+
+# Send X-DB-Queries / X-DB-Time-Ms on every API response.
+QUIZ_QUERY_HEADERS = os.environ.get("QUIZ_QUERY_HEADERS", str(DEBUG)).lower() == "true"
+
+# Raise instead of logging a warning when a view or consumer action runs
+# more queries than its declared budget. Meant for test runs.
+QUIZ_QUERY_BUDGET_STRICT = os.environ.get("QUIZ_QUERY_BUDGET_STRICT", "false").lower() == "true"
+
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 100